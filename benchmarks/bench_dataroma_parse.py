@@ -0,0 +1,76 @@
+"""Compare Dataroma holdings parsing: old BeautifulSoup path vs the regex scan.
+
+Run from the project root:
+    python benchmarks/bench_dataroma_parse.py
+"""
+import glob
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stockanalyzer import extract_dataroma_tickers
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "dataroma_holdings_*.html")
+REPEAT = 5
+
+
+def legacy_extract(content):
+    """The previous get_dataroma_portfolio parsing code, kept for comparison"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser")
+    tickers = []
+    for link in soup.find_all("a", href=lambda x: x and "/m/stock.php?sym=" in str(x)):
+        href = link.get("href", "")
+        if "sym=" in href:
+            ticker = href.split("sym=")[1]
+            if "&" in ticker:
+                ticker = ticker.split("&")[0]
+            ticker = ticker.strip().upper()
+            if ticker and len(ticker) <= 6 and ticker not in tickers:
+                tickers.append(ticker)
+    return tickers
+
+
+def best_time(func, content, number):
+    return min(timeit.repeat(lambda: func(content), number=number, repeat=REPEAT)) / number
+
+
+def main():
+    try:
+        import bs4  # noqa: F401
+        have_bs4 = True
+    except ImportError:
+        have_bs4 = False
+        print("⚠️ beautifulsoup4 not installed, timing the new parser only")
+
+    paths = sorted(glob.glob(FIXTURES))
+    if not paths:
+        print(f"❌ No fixtures found at {FIXTURES}")
+        return 1
+
+    print(f"{'fixture':32s} {'tickers':>7s} {'bs4 (ms)':>10s} {'scan (ms)':>10s} {'speedup':>8s}")
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        name = os.path.basename(path)
+        tickers = extract_dataroma_tickers(content)
+        fast = best_time(extract_dataroma_tickers, content, 200)
+
+        if have_bs4:
+            expected = legacy_extract(content)
+            if tickers != expected:
+                print(f"❌ {name}: parsers disagree\n   bs4:  {expected}\n   scan: {tickers}")
+                return 1
+            slow = best_time(legacy_extract, content, 10)
+            print(f"{name:32s} {len(tickers):7d} {slow * 1e3:10.3f} {fast * 1e3:10.3f} {slow / fast:7.1f}x")
+        else:
+            print(f"{name:32s} {len(tickers):7d} {'-':>10s} {fast * 1e3:10.3f} {'-':>8s}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Compare refreshing indicators after one new daily bar: full recompute vs incremental state.
+
+Also times a tracker's first (cold) refresh, which builds every state from stored bars.
+
+Uses a throwaway price store filled with synthetic bars, so no network is needed.
+Run from the project root:
+    python benchmarks/bench_indicators.py [symbols]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import stockanalyzer
+from stockanalyzer import IndicatorTracker, PriceHistoryStore, latest_indicators
+
+HISTORY_BARS = 250
+REPEAT = 5
+
+
+def synthetic_bars(rng, periods, end, start_price=100.0):
+    index = pd.bdate_range(end=end, periods=periods)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.02, periods)))
+    return pd.DataFrame(
+        {"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close, "Volume": 1e6},
+        index=index,
+    )
+
+
+def max_difference(left, right):
+    worst = 0.0
+    for symbol, values in left.items():
+        for name, value in values.items():
+            other = right[symbol][name]
+            if (value is None) != (other is None):
+                return float("inf")
+            if value is not None:
+                worst = max(worst, abs(value - other) / max(1.0, abs(other)))
+    return worst
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    symbols = [f"SYM{i}" for i in range(count)]
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceHistoryStore(os.path.join(directory, "bench.sqlite3"))
+        stockanalyzer.price_store = store  # latest_indicators reads the module-level store
+        for symbol in symbols:
+            store._write(symbol, synthetic_bars(rng, HISTORY_BARS, "2026-01-30"))
+
+        tracker = IndicatorTracker(store)
+        tracker.refresh(symbols, sync=False)
+
+        # One new session for every symbol
+        for symbol in symbols:
+            last_close = store.bars(symbol, limit=1)[0][4]
+            store._write(symbol, synthetic_bars(rng, 1, "2026-02-02", last_close))
+
+        incremental = tracker.refresh(symbols, sync=False)
+        full = latest_indicators(symbols, sync=False)
+        difference = max_difference(incremental, full)
+
+        full_time = min(timeit.repeat(lambda: latest_indicators(symbols, sync=False), number=1, repeat=REPEAT))
+        cold_time = min(timeit.repeat(lambda: IndicatorTracker(store).refresh(symbols, sync=False), number=1, repeat=REPEAT))
+        # Later refreshes re-read only the newest bar, which is what a quote poll looks like
+        incremental_time = min(timeit.repeat(lambda: tracker.refresh(symbols, sync=False), number=1, repeat=REPEAT))
+
+    print(f"{count} symbols, {HISTORY_BARS} bars of history, 1 new bar each")
+    print(f"full recompute:   {full_time * 1e3:8.1f} ms")
+    print(f"cold tracker:     {cold_time * 1e3:8.1f} ms")
+    print(f"incremental:      {incremental_time * 1e3:8.1f} ms ({full_time / incremental_time:.1f}x)")
+    print(f"max relative difference: {difference:.2e}")
+    # Both sides seed their EMAs from a 200-bar window, one bar apart, hence not exactly 0
+    return 0 if difference < 1e-4 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
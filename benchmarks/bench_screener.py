@@ -0,0 +1,79 @@
+"""Time screener queries over a synthetic table, after checking how filters treat missing values.
+
+No network is needed: the table columns are filled with random numbers.
+Run from the project root:
+    python benchmarks/bench_screener.py [tickers]
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from stockanalyzer import ScreenerTable, evaluate_screen_expression
+
+QUERIES = [
+    "pe < 15 and change > 0",
+    "not abs(change) > 2 and market_cap > 1e10",
+    "sector in ['Energy', 'Technology'] and pe != 20",
+]
+REPEAT = 20
+
+# Row 0 has every value, rows 1 and 2 miss pe and change respectively;
+# missing values must never match, including under != and not
+MISSING_VALUE_CASES = [
+    ("pe < 15", [True, False, False]),
+    ("not pe < 15", [False, False, True]),
+    ("pe != 15", [True, False, True]),
+    ("pe not in [10]", [False, False, True]),
+    ("not abs(change) > 5", [True, True, False]),
+    ("not (pe < 15 or abs(change) > 5)", [False, False, False]),
+]
+
+
+def check_missing_values():
+    columns = {
+        "pe": np.array([10.0, np.nan, 30.0]),
+        "change": np.array([1.0, -2.0, np.nan]),
+    }
+    failures = []
+    for expression, expected in MISSING_VALUE_CASES:
+        result = list(evaluate_screen_expression(expression, columns, 3))
+        if result != expected:
+            failures.append(f"{expression}: got {result}, expected {expected}")
+    return failures
+
+
+def synthetic_table(count, rng):
+    table = ScreenerTable([f"SYM{i}" for i in range(count)])
+    sectors = np.array(["Energy", "Technology", "Healthcare", "Financial Services"], dtype=object)
+    table.columns["name"] = table.symbols
+    table.columns["sector"] = sectors[rng.integers(0, len(sectors), count)]
+    for column, scale in (("pe", 30), ("market_cap", 1e11), ("price", 200)):
+        table.columns[column] = rng.uniform(0, scale, count)
+    table.columns["change"] = rng.normal(0, 2, count)
+    # About one value in ten is missing, as with real .info data
+    for column in ("pe", "market_cap", "change"):
+        table.columns[column][rng.random(count) < 0.1] = np.nan
+    return table
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    failures = check_missing_values()
+    for failure in failures:
+        print(f"FAIL {failure}")
+
+    table = synthetic_table(count, np.random.default_rng(0))
+    print(f"{count} tickers")
+    for query in QUERIES:
+        elapsed = min(timeit.repeat(lambda: table.query(query, "market_cap", True, 20), number=1, repeat=REPEAT))
+        print(f"{elapsed * 1e3:8.2f} ms  {query}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,39 @@
+import time
+_MODULE_START = time.perf_counter()
+
 import sys
 import os
-from gpt4all import GPT4All
-import requests
-import tkinter as tk
-from tkinter import scrolledtext, messagebox, ttk
+import importlib
+import importlib.util
+try:
+    import tkinter as tk
+    from tkinter import scrolledtext, messagebox, ttk
+except ImportError:
+    # Headless boxes only use the command line and never build a window
+    tk = None
 import threading
-import yfinance as yf
-from bs4 import BeautifulSoup
-import time
 import logging
 import traceback
+import sqlite3
+import hashlib
+import queue
+import itertools
+import json
+import re
+import math
+import glob
+import argparse
+import ast
+import operator
+import csv
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, TimeoutError as FuturesTimeout
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+_EAGER_IMPORTS_DONE = time.perf_counter()
 
 # Logging setup with better error handling
 try:
@@ -18,59 +42,329 @@ try:
         level=logging.DEBUG,
         format="%(asctime)s - %(levelname)s - %(message)s",
     )
-    print("✅ Logging initialized")
+    print("✅ Logging initialized", file=sys.stderr)
 except Exception as e:
     print(f"⚠️ Could not initialize logging: {e}")
     # Continue without logging if it fails
 
+# Startup timing: seconds per deferred import, plus milestones such as first paint
+IMPORT_TIMINGS = OrderedDict()
+STARTUP_TIMINGS = OrderedDict([("eager imports", _EAGER_IMPORTS_DONE - _MODULE_START)])
+
+class LazyModule:
+    """Stand-in for a heavy module that is only imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                start = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                elapsed = time.perf_counter() - start
+                IMPORT_TIMINGS[self._name] = elapsed
+                logging.info(f"Imported {self._name} in {elapsed * 1000:.0f} ms")
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+gpt4all = LazyModule("gpt4all")
+yf = LazyModule("yfinance")
+requests = LazyModule("requests")
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+
+def mark_startup(milestone):
+    STARTUP_TIMINGS[milestone] = time.perf_counter() - _MODULE_START
+
+def startup_report():
+    """Human-readable startup timings: milestones since module load and deferred imports"""
+    lines = ["⏱️ STARTUP TIMINGS (since module load):"]
+    for milestone, elapsed in STARTUP_TIMINGS.items():
+        lines.append(f"  {milestone:24s} {elapsed * 1000:8.0f} ms")
+    if IMPORT_TIMINGS:
+        lines.append("  Deferred imports:")
+        for name, elapsed in IMPORT_TIMINGS.items():
+            lines.append(f"    {name:22s} {elapsed * 1000:8.0f} ms")
+    return "\n".join(lines)
+
+# Parallel .info lookups for the holdings table (Yahoo throttles wider fan-outs)
+HOLDINGS_INFO_WORKERS = 8
+
+# Concurrent per-ticker quote lookups (investor portfolios) and their timeout in seconds
+QUOTE_FETCH_WORKERS = 6
+QUOTE_FETCH_TIMEOUT = 15
+
+# Polite Dataroma request rate (requests per second), burst size and connection pool size
+DATAROMA_RATE = 0.5
+DATAROMA_BURST = 2
+DATAROMA_POOL_SIZE = 4
+DATAROMA_FETCH_TIMEOUT = 30
+
+# Dataroma holdings cache: re-check interval while 13F filings for the quarter are
+# still arriving, and days after the filing deadline before a scrape counts as final
+HOLDINGS_FILING_WINDOW_TTL = 7 * 24 * 60 * 60
+HOLDINGS_SETTLE_DAYS = 7
+
+# Sampling settings for stock analyses (conservative values keep small CPU models stable)
+AI_GENERATION_PARAMS = {
+    "max_tokens": 200,
+    "temp": 0.1,
+    "top_p": 0.8,
+    "repeat_penalty": 1.05,
+}
+
+# Fixed instruction header of every analysis prompt; the inference worker keeps it
+# evaluated in the model's KV cache so each request only processes its own suffix
+ANALYST_PROMPT_PREFIX = (
+    "YOU ARE A FINANCIAL ANALYST AI. GIVE A DETAILED ANALYSIS OF THE STOCK MARKET DATA BELOW. "
+    "DONT USE TOO MUCH JARGON, BE CONCISE AND TO THE POINT.\n\n"
+)
+
+# Batch screening: prompts kept queued for the model at once, per-symbol time limit
+# (seconds, including queue time), and where ranked results are written
+SCREEN_MAX_IN_FLIGHT = 16
+SCREEN_ITEM_TIMEOUT = 30 * 60
+SCREEN_OUTPUT_DIR = "screens"
+WATCHLIST_PATH = "watchlist.txt"
+
+# How often streamed AI tokens are flushed into the result pane, in milliseconds
+STREAM_FLUSH_MS = 50
+
+# Treeview refreshes apply at most this many row/cell changes per Tk callback
+TREE_UPDATE_CHUNK = 50
+
+# Live quote polling: US market sessions in minutes after midnight New York time,
+# seconds between polls per session, and the backoff after failed polls
+MARKET_TIMEZONE = "America/New_York"
+MARKET_SESSIONS = {
+    "pre_market": (4 * 60, 9 * 60 + 30),
+    "open": (9 * 60 + 30, 16 * 60),
+    "after_hours": (16 * 60, 20 * 60),
+}
+POLL_INTERVALS = {"pre_market": 120, "open": 15, "after_hours": 120}
+POLL_CLOSED_RECHECK = 30 * 60
+POLL_BACKOFF_FACTOR = 2
+POLL_BACKOFF_MAX = 10 * 60
+
+# Local HTTP service (python stockanalyzer.py serve)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+# Latency samples kept per endpoint, and the window used for requests/sec (seconds)
+SERVICE_LATENCY_SAMPLES = 1000
+SERVICE_THROUGHPUT_WINDOW = 60
+
+# Inference queue priorities: lower runs first, so clicks jump ahead of batch work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# How long each kind of Yahoo data stays fresh in the shared cache, in seconds
+CACHE_TTLS = {
+    "quote": 30,
+    "info": 6 * 60 * 60,
+    "intraday_1d": 60,
+    "intraday_5d": 5 * 60,
+}
+CACHE_MAX_ENTRIES = 512
+
+class TTLCache:
+    """Thread-safe LRU cache keyed by (symbol, kind) with a TTL per kind"""
+
+    def __init__(self, ttls, max_entries=CACHE_MAX_ENTRIES):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, kind):
+        key = (symbol.upper(), kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, symbol, kind, value):
+        key = (symbol.upper(), kind)
+        expires_at = time.monotonic() + self.ttls.get(kind, 60)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, symbol=None, kind=None):
+        """Drop matching entries; with no arguments the whole cache is cleared"""
+        with self._lock:
+            if symbol is None and kind is None:
+                self._entries.clear()
+                return
+            symbol = symbol.upper() if symbol else None
+            for key in list(self._entries):
+                if (symbol is None or key[0] == symbol) and (kind is None or key[1] == kind):
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+data_cache = TTLCache(CACHE_TTLS)
+
+# Local on-disk data (price history, scraped pages)
+CACHE_DIR = "cache"
+PRICE_DB_PATH = os.path.join(CACHE_DIR, "price_history.sqlite3")
+HOLDINGS_CACHE_PATH = os.path.join(CACHE_DIR, "dataroma_holdings.json")
+AI_CACHE_PATH = os.path.join(CACHE_DIR, "ai_analysis.json")
+# Screener fundamentals (.info fields) per ticker, reused across runs for CACHE_TTLS["info"]
+SCREENER_CACHE_PATH = os.path.join(CACHE_DIR, "screener_fundamentals.json")
+SCREENER_CACHE_MAX_ENTRIES = 5000
+# Cached AI analyses older than this (seconds) are regenerated; the file keeps at most this many
+AI_CACHE_MAX_AGE = 6 * 60 * 60
+AI_CACHE_MAX_ENTRIES = 500
+# Seconds before the store asks Yahoo for bars newer than the last one it holds
+PRICE_REFRESH_INTERVAL = 60
+# History downloaded the first time a symbol is seen
+PRICE_INITIAL_PERIOD = "1y"
+# Yahoo's closes are split-adjusted as of the download. When a re-downloaded
+# completed bar differs from the stored one by more than this fraction, the
+# symbol had a split and its stored history is replaced
+PRICE_REVISION_TOLERANCE = 0.01
+
+# Chart ranges: intraday ones are downloaded on demand and cached briefly,
+# daily ones are read from the price store, which backfills older bars once
+CHART_RANGES = OrderedDict([
+    ("1D", {"period": "1d", "interval": "5m"}),
+    ("5D", {"period": "5d", "interval": "30m"}),
+    ("1M", {"days": 31}),
+    ("3M", {"days": 92}),
+    ("1Y", {"days": 365}),
+    ("5Y", {"days": 5 * 365}),
+    ("10Y", {"days": 10 * 365}),
+    ("MAX", {"days": None}),
+])
+CHART_DEFAULT_RANGE = "1M"
+# Long histories are bucketed so each bucket covers this many pixels of the
+# plot and contributes its low and high, keeping drawn points <= plot width
+CHART_BUCKET_PIXELS = 2
+# Most tickers overlaid by "compare ..."; longer lists keep their first entries
+COMPARE_MAX_SYMBOLS = 20
+
+# Technical indicators: bars loaded per symbol and the period of each indicator
+INDICATOR_LOOKBACK_BARS = 200
+INDICATOR_PERIODS = {
+    "sma_short": 20,
+    "sma_long": 50,
+    "rsi": 14,
+    "macd": (12, 26, 9),
+    "bollinger": (20, 2.0),
+    "atr": 14,
+    "volatility": 20,
+}
+TRADING_DAYS_PER_YEAR = 252
+
+# Screener columns read from yfinance .info (the first key present wins), and the
+# columns every screener result shows before the ones a query mentions
+SCREENER_INFO_FIELDS = OrderedDict([
+    ("pe", ("trailingPE", "forwardPE")),
+    ("forward_pe", ("forwardPE",)),
+    ("pb", ("priceToBook",)),
+    ("market_cap", ("marketCap",)),
+    ("dividend_yield", ("dividendYield",)),
+    ("beta", ("beta",)),
+    ("eps", ("trailingEps",)),
+    ("high_52w", ("fiftyTwoWeekHigh",)),
+    ("low_52w", ("fiftyTwoWeekLow",)),
+])
+SCREENER_DISPLAY_COLUMNS = ["price", "change", "pe", "market_cap"]
+
+DATAROMA_INVESTORS = {
+    "warren buffett": "BRK",
+    "bill gates": "GFT",
+    "bill ackman": "psc",
+    "charlie munger": "DJCO",
+    "michael burry": "SAM",
+    "ray dalio": "BRIDGE",
+    "joel greenblatt": "GOTHAM",
+    "tiger global": "TGM",
+    "jeff bezos": "AMZN",
+    "david einhorn": "GLRE",
+    "seth klarman": "BAUPOST",
+    "leon cooperman": "oa",
+    "carl icahn": "ic",
+    "david tepper": "AM",
+    "bill miller": "LMM",
+    "chuck akre": "AC",
+    "mohnish pabrai": "PI",
+    "guy spier": "aq",
+    "li lu": "HC",
+    "prem watsa": "FFH",
+    "francis chou": "ca",
+    "thomas russo": "GR",
+    "mason hawkins": "LLPFX",
+    "chase coleman": "TGM",
+    "lee ainslie": "mc",
+    "daniel loeb": "tp",
+    "david abrams": "abc",
+    "bruce berkowitz": "fairx",
+    "glenn greenberg": "CCM",
+    "pat dorsey": "DA",
+    "christopher davis": "DAV",
+    "john rogers": "CAAPX",
+    "bill nygren": "oaklx",
+    "dodge cox": "DODGX",
+    "third avenue": "TA",
+    "first eagle": "FE",
+}
+
 def resolve_name_to_dataroma_code(name):
     name = name.strip().lower()
-    name_map = {
-        "warren buffett": "BRK",
-        "bill gates": "GFT",
-        "bill ackman": "psc",
-        "charlie munger": "DJCO",
-        "michael burry": "SAM",
-        "ray dalio": "BRIDGE",
-        "joel greenblatt": "GOTHAM",
-        "tiger global": "TGM",
-        "jeff bezos": "AMZN",
-        "david einhorn": "GLRE",
-        "seth klarman": "BAUPOST",
-        "leon cooperman": "oa",
-        "carl icahn": "ic",
-        "david tepper": "AM",
-        "bill miller": "LMM",
-        "chuck akre": "AC",
-        "mohnish pabrai": "PI",
-        "guy spier": "aq",
-        "li lu": "HC",
-        "prem watsa": "FFH",
-        "francis chou": "ca",
-        "thomas russo": "GR",
-        "mason hawkins": "LLPFX",
-        "chase coleman": "TGM",
-        "lee ainslie": "mc",
-        "daniel loeb": "tp",
-        "david abrams": "abc",
-        "bruce berkowitz": "fairx",
-        "glenn greenberg": "CCM",
-        "pat dorsey": "DA",
-        "christopher davis": "DAV",
-        "john rogers": "CAAPX",
-        "bill nygren": "oaklx",
-        "dodge cox": "DODGX",
-        "third avenue": "TA",
-        "first eagle": "FE",
-    }
-    return name_map.get(name)
+    return DATAROMA_INVESTORS.get(name)
 
-def get_dataroma_portfolio(investor_code):
-    if not investor_code:
-        return []
+class TokenBucket:
+    """Blocking token-bucket limiter: only callers arriving faster than rate have to wait"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class DataromaClient:
+    """Pooled, rate-limited HTTP client for dataroma.com that revalidates pages with conditional GETs"""
 
-    url = f"https://www.dataroma.com/m/holdings.php?m={investor_code}"
-    headers = {
+    BASE_URL = "https://www.dataroma.com"
+    HEADERS = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,/;q=0.8",
         "Accept-Language": "en-US,en;q=0.9",
@@ -80,138 +374,3065 @@ def get_dataroma_portfolio(investor_code):
         "Upgrade-Insecure-Requests": "1",
     }
 
+    def __init__(self, rate=DATAROMA_RATE, burst=DATAROMA_BURST):
+        self.limiter = TokenBucket(rate, burst)
+        self._session = None
+        self._lock = threading.Lock()
+        # url -> (etag, last_modified, body) of the last 200 response
+        self._validated = {}
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                session.headers.update(self.HEADERS)
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=DATAROMA_POOL_SIZE)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def get(self, path, timeout=15):
+        """Page body for path; an unchanged page costs a 304 instead of a full download"""
+        url = self.BASE_URL + path
+        with self._lock:
+            cached = self._validated.get(url)
+
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        self.limiter.acquire()
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached:
+            logging.debug(f"Dataroma page not modified: {url}")
+            return cached[2]
+        response.raise_for_status()
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._lock:
+                self._validated[url] = (etag, last_modified, response.content)
+        return response.content
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+dataroma_client = DataromaClient()
+
+class JsonFileCache:
+    """Persistent key/value cache kept in one JSON file, capped at max_entries (LRU)"""
+
+    def __init__(self, path, max_entries=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = OrderedDict(json.load(f))
+            except (OSError, ValueError):
+                self._entries = OrderedDict()
+        return self._entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key, max_age=None):
+        """(value, stored_at) for key, or None when missing or older than max_age seconds"""
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                return None
+            if max_age is not None and time.time() - entry["stored_at"] > max_age:
+                return None
+            self._entries.move_to_end(key)
+            return entry["value"], entry["stored_at"]
+
+    def set(self, key, value):
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"stored_at": time.time(), "value": value}
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                logging.error(f"Could not write cache file {self.path}: {e}")
+
+    def set_many(self, items):
+        """Store every (key, value) of a dict with a single file write"""
+        if not items:
+            return
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            for key, value in items.items():
+                entries[key] = {"stored_at": now, "value": value}
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                logging.error(f"Could not write cache file {self.path}: {e}")
+
+holdings_cache = JsonFileCache(HOLDINGS_CACHE_PATH)
+analysis_cache = JsonFileCache(AI_CACHE_PATH, max_entries=AI_CACHE_MAX_ENTRIES)
+screener_info_cache = JsonFileCache(SCREENER_CACHE_PATH, max_entries=SCREENER_CACHE_MAX_ENTRIES)
+
+def analysis_cache_key(prompt, model_path, gen_kwargs):
+    """Fingerprint of everything that decides an AI answer: prompt, model file and sampling"""
+    payload = json.dumps(
+        {
+            "prompt": " ".join(prompt.split()),
+            "model": os.path.basename(model_path or ""),
+            "params": gen_kwargs,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def filing_quarter(today=None):
+    """Label of the most recently ended quarter and the 13F filing deadline for it"""
+    today = today or date.today()
+    year, quarter = today.year, (today.month - 1) // 3
+    if quarter == 0:
+        year, quarter = year - 1, 4
+    quarter_end = date(year, 3 * quarter, 31 if quarter in (1, 4) else 30)
+    return f"{year}Q{quarter}", quarter_end + timedelta(days=45)
+
+def holdings_entry_is_fresh(stored_at, now=None):
+    """Whether a holdings scrape taken at stored_at can still be trusted.
+
+    Scrapes taken after the quarter's filing deadline (plus time for Dataroma
+    to catch up) are final until the next quarter changes the cache key;
+    earlier ones are re-checked every few days while filings arrive.
+    """
+    now = now or time.time()
+    _, deadline = filing_quarter(date.fromtimestamp(now))
+    if date.fromtimestamp(stored_at) >= deadline + timedelta(days=HOLDINGS_SETTLE_DAYS):
+        return True
+    return now - stored_at < HOLDINGS_FILING_WINDOW_TTL
+
+# Ticker out of every anchor pointing at a Dataroma stock page, e.g. href="/m/stock.php?sym=AAPL"
+_STOCK_LINK_RE = re.compile(rb"""href\s*=\s*["']?[^"'\s>]*/m/stock\.php\?sym=([^"'&<>\s#]+)""", re.IGNORECASE)
+
+def extract_dataroma_tickers(content):
+    """Tickers linked from a holdings page, in page order and without duplicates"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    tickers = {}
+    for match in _STOCK_LINK_RE.finditer(content):
+        ticker = match.group(1).decode("ascii", "ignore").strip().upper()
+        if ticker and len(ticker) <= 6:
+            tickers.setdefault(ticker, None)
+    return list(tickers)
+
+def fetch_dataroma_holdings(investor_code):
+    """Scrape every ticker listed on an investor's Dataroma holdings page"""
+    return extract_dataroma_tickers(dataroma_client.get(f"/m/holdings.php?m={investor_code}"))
+
+def get_dataroma_holdings(investor_code):
+    """Full holdings list for investor_code, served from the 13F-aware cache when possible"""
+    quarter, _ = filing_quarter()
+    key = f"{investor_code}|{quarter}"
+    cached = holdings_cache.get(key)
+    if cached is not None and holdings_entry_is_fresh(cached[1]):
+        return cached[0]
+
     try:
         logging.debug(f"Fetching portfolio for: {investor_code}")
-        time.sleep(2)
-        session = requests.Session()
-        session.headers.update(headers)
-        response = session.get(url, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        stock_links = soup.find_all("a", href=lambda x: x and "/m/stock.php?sym=" in str(x))
-        if stock_links:
-            tickers = []
-            for link in stock_links:
-                href = link.get("href", "")
-                if "sym=" in href:
-                    ticker = href.split("sym=")[1]
-                    if "&" in ticker:
-                        ticker = ticker.split("&")[0]
-                    ticker = ticker.strip().upper()
-                    if ticker and len(ticker) <= 6 and ticker not in tickers:
-                        tickers.append(ticker)
-            return tickers[:15]
+        tickers = fetch_dataroma_holdings(investor_code)
+    except Exception:
+        # Better a slightly old filing than nothing when Dataroma is unreachable
+        if cached is None:
+            raise
+        logging.warning(f"Serving stale holdings for {investor_code}")
+        return cached[0]
+
+    if tickers:
+        holdings_cache.set(key, tickers)
+    return tickers
+
+def get_dataroma_portfolio(investor_code):
+    if not investor_code:
         return []
 
+    try:
+        return get_dataroma_holdings(investor_code)[:15]
     except Exception as e:
         logging.error(f"Error scraping Dataroma: {e}")
         return []
 
-def get_buffett_top_holdings_data():
+class HoldingsIndex:
+    """Holdings of every mapped superinvestor plus an inverted ticker -> investors index"""
+
+    def __init__(self):
+        self.by_investor = {}
+        self.by_ticker = {}
+        self.failed = []
+        self.loaded_at = None
+
+    def add(self, investor_name, tickers):
+        self.by_investor[investor_name] = list(tickers)
+        for ticker in tickers:
+            self.by_ticker.setdefault(ticker, []).append(investor_name)
+
+    def holders_of(self, ticker):
+        return self.by_ticker.get(ticker.strip().upper(), [])
+
+    def tickers(self):
+        return list(self.by_ticker)
+
+def load_all_portfolios(max_workers=DATAROMA_POOL_SIZE):
+    """Fetch every mapped investor's holdings concurrently and index them by ticker.
+
+    All requests share dataroma_client's rate limiter, and investors that map
+    to the same Dataroma code are only fetched once.
+    """
+    names_by_code = OrderedDict()
+    for name, code in DATAROMA_INVESTORS.items():
+        names_by_code.setdefault(code, []).append(name.title())
+
+    start = time.time()
+    results = fetch_concurrently(
+        get_dataroma_holdings, list(names_by_code), max_workers=max_workers, timeout=DATAROMA_FETCH_TIMEOUT
+    )
+
+    index = HoldingsIndex()
+    for (code, names), holdings in zip(names_by_code.items(), results):
+        if isinstance(holdings, Exception) or not holdings:
+            logging.warning(f"No holdings loaded for {code}: {holdings if isinstance(holdings, Exception) else 'empty page'}")
+            index.failed.extend(names)
+            continue
+        for name in names:
+            index.add(name, holdings)
+    index.loaded_at = time.time()
+    logging.info(
+        f"Loaded {len(index.by_investor)} portfolios ({len(index.by_ticker)} tickers) "
+        f"in {index.loaded_at - start:.1f}s, {len(index.failed)} failed"
+    )
+    return index
+
+_holdings_index = None
+_holdings_index_lock = threading.Lock()
+
+def get_holdings_index(refresh=False):
+    """Shared HoldingsIndex, built on first use (later calls only read memory)"""
+    global _holdings_index
+    with _holdings_index_lock:
+        if _holdings_index is None or refresh:
+            _holdings_index = load_all_portfolios()
+        return _holdings_index
+
+def _history_for_ticker(frame, ticker):
+    """Pull a single ticker's OHLCV rows out of a yf.download frame"""
+    if frame is None or frame.empty:
+        return None
+    if getattr(frame.columns, "nlevels", 1) > 1:
+        if ticker not in frame.columns.get_level_values(0):
+            return None
+        frame = frame[ticker]
+    hist = frame.dropna(subset=["Close"])
+    return None if hist.empty else hist
+
+def quote_from_history(hist):
+    """Latest close/previous close/high/low from a daily history frame"""
+    return {
+        "c": hist["Close"].iloc[-1],
+        "pc": hist["Close"].iloc[-2] if len(hist) > 1 else hist["Close"].iloc[-1],
+        "h": hist["High"].iloc[-1],
+        "l": hist["Low"].iloc[-1],
+    }
+
+def fetch_bulk_history(tickers, period="2d", start=None, end=None, interval="1d", auto_adjust=True):
+    """Download history for the whole ticker list in a single round trip"""
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    try:
+        # yf.download keeps its results in module-level state, so concurrent
+        # calls from different threads can clobber each other
+        with _download_lock:
+            frame = yf.download(
+                tickers,
+                period=None if start else period,
+                start=start,
+                end=end,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=auto_adjust,
+                threads=True,
+                progress=False,
+            )
+    except Exception as e:
+        logging.error(f"Bulk history download failed for {len(tickers)} tickers: {e}")
+        return {}
+
+    histories = {}
+    for ticker in tickers:
+        hist = _history_for_ticker(frame, ticker)
+        if hist is not None:
+            histories[ticker] = hist
+    return histories
+
+_download_lock = threading.Lock()
+
+class PriceHistoryStore:
+    """SQLite store of daily OHLCV bars that only downloads the bars it is missing.
+
+    Functions in on_rewrite are called with a symbol whose stored history
+    was replaced after a split, so anything derived from it can be rebuilt.
+    """
+
+    def __init__(self, path=PRICE_DB_PATH, refresh_interval=PRICE_REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._conn = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._checked_at = {}
+        # How far back Yahoo was already asked per symbol, so young listings aren't re-requested
+        self._backfilled = {}
+        self.on_rewrite = []
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID"""
+            )
+            self._conn = conn
+        return self._conn
+
+    def last_bar_dates(self, symbols):
+        """Map each symbol to the date string of the newest bar held locally"""
+        if not symbols:
+            return {}
+        placeholders = ",".join("?" * len(symbols))
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT symbol, MAX(date) FROM bars WHERE symbol IN ({placeholders}) GROUP BY symbol",
+                list(symbols),
+            ).fetchall()
+        return dict(rows)
+
+    def first_bar_dates(self, symbols):
+        """Map each symbol to the date string of the oldest bar held locally"""
+        if not symbols:
+            return {}
+        placeholders = ",".join("?" * len(symbols))
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT symbol, MIN(date) FROM bars WHERE symbol IN ({placeholders}) GROUP BY symbol",
+                list(symbols),
+            ).fetchall()
+        return dict(rows)
+
+    def _write(self, symbol, hist):
+        hist = hist.fillna({"Volume": 0})
+        rows = [
+            (symbol, ts.strftime("%Y-%m-%d"), float(o), float(h), float(l), float(c), float(v))
+            for ts, o, h, l, c, v in zip(
+                hist.index, hist["Open"], hist["High"], hist["Low"], hist["Close"], hist["Volume"]
+            )
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        return len(rows)
+
+    def sync(self, symbols, force=False):
+        """Bring the store up to date for symbols, at most one download per group; returns bars written"""
+        symbols = [s.upper() for s in dict.fromkeys(symbols)]
+        with self._sync_lock:
+            now = time.monotonic()
+            due = [
+                s for s in symbols
+                if force or now - self._checked_at.get(s, float("-inf")) >= self.refresh_interval
+            ]
+            if not due:
+                return 0
+            last_dates = self.last_bar_dates(due)
+            new_symbols = [s for s in due if s not in last_dates]
+            known_symbols = [s for s in due if s in last_dates]
+
+            fetched = {}
+            if new_symbols:
+                fetched.update(fetch_bulk_history(new_symbols, period=PRICE_INITIAL_PERIOD, auto_adjust=False))
+            split_symbols = []
+            if known_symbols:
+                # Re-download from the last completed bar: the newest stored bar
+                # may have been a partial intraday one, the one before it is the
+                # reference for spotting a split
+                reference = {s: self.bars(s, limit=2)[0] for s in known_symbols}
+                start = min(bar[0] for bar in reference.values())
+                fetched.update(fetch_bulk_history(known_symbols, start=start, auto_adjust=False))
+                split_symbols = [s for s in known_symbols if s in fetched and self._history_revised(reference[s], fetched[s])]
+            if split_symbols:
+                logging.info(f"Price history revised (split?) for {', '.join(split_symbols)}; downloading it again")
+                self._delete(split_symbols)
+                for symbol in split_symbols:
+                    fetched.pop(symbol, None)
+                    self._backfilled.pop(symbol, None)
+                fetched.update(fetch_bulk_history(split_symbols, period=PRICE_INITIAL_PERIOD, auto_adjust=False))
+
+            written = sum(self._write(symbol, hist) for symbol, hist in fetched.items())
+            for symbol in due:
+                self._checked_at[symbol] = now
+            for symbol in split_symbols:
+                for callback in self.on_rewrite:
+                    callback(symbol)
+            logging.debug(f"Price store sync: {len(due)} symbols due, {written} bars written")
+            return written
+
+    @staticmethod
+    def _history_revised(reference, hist):
+        """True when hist's close for the reference bar's date no longer matches the stored close"""
+        date_text, close = reference[0], reference[4]
+        closes = dict(zip(hist.index.strftime("%Y-%m-%d"), hist["Close"]))
+        fresh = closes.get(date_text)
+        if fresh is None or not close:
+            return False
+        return abs(fresh / close - 1) > PRICE_REVISION_TOLERANCE
+
+    def _delete(self, symbols):
+        placeholders = ",".join("?" * len(symbols))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"DELETE FROM bars WHERE symbol IN ({placeholders})", list(symbols))
+            conn.commit()
+
+    def backfill(self, symbols, start=None):
+        """Extend stored history back to start (None: everything Yahoo has) in one download; returns bars written"""
+        symbols = [s.upper() for s in dict.fromkeys(symbols)]
+        self.sync(symbols)
+        target = str(start) if start else ""
+        # A few days of slack covers weekends and holidays at the start of the range
+        wanted = str(start + timedelta(days=5)) if start else ""
+        with self._sync_lock:
+            first_dates = self.first_bar_dates(symbols)
+            due = [
+                s for s in symbols
+                if s in first_dates and first_dates[s] > wanted and self._backfilled.get(s, first_dates[s]) > target
+            ]
+            if not due:
+                return 0
+            # Yahoo's end date is exclusive, and re-writing overlapping bars is harmless
+            end = max(first_dates[s] for s in due)
+            fetched = fetch_bulk_history(due, period="max", start=start, end=end, auto_adjust=False)
+            written = sum(self._write(symbol, hist) for symbol, hist in fetched.items())
+            for symbol in due:
+                self._backfilled[symbol] = target
+            logging.debug(f"Price store backfill to {target or 'max'}: {len(due)} symbols, {written} bars written")
+            return written
+
+    def history(self, symbol, start=None, limit=None, sync=True):
+        """Daily bars for symbol as a DataFrame, oldest first; None when nothing is stored"""
+        symbol = symbol.upper()
+        if sync:
+            self.sync([symbol])
+
+        rows = self.bars(symbol, start=start, limit=limit)
+        if not rows:
+            return None
+        frame = pd.DataFrame(
+            [row[1:] for row in rows],
+            columns=["Open", "High", "Low", "Close", "Volume"],
+            index=pd.to_datetime([row[0] for row in rows]),
+        )
+        return frame
+
+    def bars(self, symbol, start=None, limit=None):
+        """Raw (date, open, high, low, close, volume) rows, oldest first, without syncing"""
+        query = "SELECT date, open, high, low, close, volume FROM bars WHERE symbol = ?"
+        params = [symbol.upper()]
+        if start:
+            query += " AND date >= ?"
+            params.append(str(start))
+        query += " ORDER BY date DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        rows.reverse()
+        return rows
+
+    def bar_matrix(self, symbols, limit=INDICATOR_LOOKBACK_BARS, sync=True):
+        """Newest `limit` bars of every symbol as symbols x time float arrays.
+
+        Rows are right-aligned, so column -1 is each symbol's latest bar and
+        slots before a symbol's first stored bar are NaN. Returns (symbols,
+        {"open", "high", "low", "close", "volume"}).
+        """
+        symbols = [s.upper() for s in dict.fromkeys(symbols)]
+        if sync:
+            self.sync(symbols)
+        arrays = {field: np.full((len(symbols), limit), np.nan) for field in ("open", "high", "low", "close", "volume")}
+        if not symbols:
+            return symbols, arrays
+
+        # One indexed query per symbol beats a window function over the whole IN list
+        with self._lock:
+            conn = self._connect()
+            for row, symbol in enumerate(symbols):
+                bars = conn.execute(
+                    "SELECT open, high, low, close, volume FROM bars WHERE symbol = ? ORDER BY date DESC LIMIT ?",
+                    (symbol, limit),
+                ).fetchall()
+                if bars:
+                    values = np.array(bars[::-1], dtype=float)
+                    for i, field in enumerate(("open", "high", "low", "close", "volume")):
+                        arrays[field][row, limit - len(bars):] = values[:, i]
+        return symbols, arrays
+
+price_store = PriceHistoryStore()
+
+def _front_pad(values, width):
+    """Prepend width NaN columns so a trimmed result lines up with its input"""
+    pad = np.full((values.shape[0], width), np.nan)
+    return np.concatenate([pad, values], axis=1)
+
+def rolling_windows(values, n):
+    """(symbols, time, n) view of trailing windows; the first n-1 windows contain NaN"""
+    return np.lib.stride_tricks.sliding_window_view(_front_pad(values, n - 1), n, axis=1)
+
+def sma(values, n):
+    """Simple moving average along time for every row at once"""
+    return rolling_windows(values, n).mean(axis=-1)
+
+def rolling_std(values, n, ddof=0):
+    return rolling_windows(values, n).std(axis=-1, ddof=ddof)
+
+def ema(values, n=None, alpha=None, min_periods=None):
+    """Exponential moving average along time, seeded with each row's first value.
+
+    Matches pandas ewm(adjust=False). The loop runs over time only; each step
+    updates every symbol at once. Pass alpha=1/n for Wilder smoothing.
+    """
+    if alpha is None:
+        alpha = 2.0 / (n + 1)
+    result = np.full(values.shape, np.nan)
+    current = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        column = values[:, t]
+        current = np.where(np.isnan(current), column, np.where(np.isnan(column), current, alpha * column + (1 - alpha) * current))
+        result[:, t] = current
+    seen = np.cumsum(~np.isnan(values), axis=1)
+    result[seen < (min_periods or n or 1)] = np.nan
+    return result
+
+def rsi(close, n=14):
+    """Wilder's relative strength index, 0-100"""
+    delta = _front_pad(np.diff(close, axis=1), 1)
+    gains = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    losses = np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None))
+    avg_gain = ema(gains, alpha=1.0 / n, min_periods=n)
+    avg_loss = ema(losses, alpha=1.0 / n, min_periods=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, result)
+
+def macd(close, fast=12, slow=26, signal=9):
+    """MACD line, signal line and histogram"""
+    line = ema(close, fast, min_periods=slow) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+def bollinger_bands(close, n=20, width=2.0):
+    """Lower band, middle band (SMA) and upper band"""
+    middle = sma(close, n)
+    spread = width * rolling_std(close, n)
+    return middle - spread, middle, middle + spread
+
+def average_true_range(high, low, close, n=14):
+    previous_close = _front_pad(close[:, :-1], 1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    return ema(true_range, alpha=1.0 / n, min_periods=n)
+
+def rolling_volatility(close, n=20):
+    """Annualized standard deviation of daily log returns"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = _front_pad(np.diff(np.log(close), axis=1), 1)
+    return rolling_std(returns, n, ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR)
+
+def compute_indicators(bars):
+    """Every indicator series for a symbols x time bar matrix (see PriceHistoryStore.bar_matrix)"""
+    close, high, low = bars["close"], bars["high"], bars["low"]
+    macd_line, macd_signal, macd_hist = macd(close, *INDICATOR_PERIODS["macd"])
+    bb_lower, bb_middle, bb_upper = bollinger_bands(close, *INDICATOR_PERIODS["bollinger"])
+    return {
+        "close": close,
+        "sma_short": sma(close, INDICATOR_PERIODS["sma_short"]),
+        "sma_long": sma(close, INDICATOR_PERIODS["sma_long"]),
+        "ema_fast": ema(close, INDICATOR_PERIODS["macd"][0]),
+        "ema_slow": ema(close, INDICATOR_PERIODS["macd"][1]),
+        "rsi": rsi(close, INDICATOR_PERIODS["rsi"]),
+        "macd": macd_line,
+        "macd_signal": macd_signal,
+        "macd_hist": macd_hist,
+        "bb_lower": bb_lower,
+        "bb_middle": bb_middle,
+        "bb_upper": bb_upper,
+        "atr": average_true_range(high, low, close, INDICATOR_PERIODS["atr"]),
+        "volatility": rolling_volatility(close, INDICATOR_PERIODS["volatility"]),
+    }
+
+def latest_indicators(symbols, sync=True):
+    """Newest value of every indicator per symbol, computed in one pass over all of them.
+
+    Returns {symbol: {name: float or None}}; symbols without stored bars are left out.
+    """
+    symbols, bars = price_store.bar_matrix(symbols, sync=sync)
+    if not symbols:
+        return {}
+    series = compute_indicators(bars)
+    has_bars = ~np.isnan(bars["close"][:, -1])
+    snapshots = {}
+    for row, symbol in enumerate(symbols):
+        if has_bars[row]:
+            snapshots[symbol] = {
+                name: (None if np.isnan(values[row, -1]) else float(values[row, -1]))
+                for name, values in series.items()
+            }
+    return snapshots
+
+class RollingWindow:
+    """Mean and variance of the last n values, O(1) per push (Welford's update with removal)"""
+
+    def __init__(self, n):
+        self.n = n
+        self.values = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    @property
+    def full(self):
+        return len(self.values) == self.n
+
+    def push(self, value):
+        if self.full:
+            old = self.values.popleft()
+            if self.values:
+                delta = old - self.mean
+                self.mean -= delta / len(self.values)
+                self._m2 -= delta * (old - self.mean)
+            else:
+                self.mean = self._m2 = 0.0
+        self.values.append(value)
+        delta = value - self.mean
+        self.mean += delta / len(self.values)
+        self._m2 += delta * (value - self.mean)
+
+    def variance(self, ddof=0):
+        return max(self._m2, 0.0) / (len(self.values) - ddof)
+
+    def copy(self):
+        clone = RollingWindow(self.n)
+        clone.values = deque(self.values)
+        clone.mean = self.mean
+        clone._m2 = self._m2
+        return clone
+
+class RunningEMA:
+    """Exponential moving average seeded with the first value (pandas ewm(adjust=False))"""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = None
+        self.count = 0
+
+    def push(self, value):
+        self.value = value if self.value is None else self.alpha * value + (1 - self.alpha) * self.value
+        self.count += 1
+
+    def current(self, min_periods):
+        return self.value if self.count >= min_periods else None
+
+    def copy(self):
+        clone = RunningEMA(self.alpha)
+        clone.value = self.value
+        clone.count = self.count
+        return clone
+
+class IndicatorState:
+    """Online version of compute_indicators for one symbol, advanced one daily bar at a time.
+
+    Each update costs the same whatever the length of history. Sending the
+    newest bar's date again (a partial intraday bar that has since moved)
+    rolls back to the state before that bar and applies the new values.
+    """
+
+    def __init__(self, periods=INDICATOR_PERIODS):
+        self.periods = periods
+        fast, slow, signal = periods["macd"]
+        self.last_date = None
+        self.last_bar = None
+        self.close = None
+        self.sma_short = RollingWindow(periods["sma_short"])
+        self.sma_long = RollingWindow(periods["sma_long"])
+        self.bollinger = RollingWindow(periods["bollinger"][0])
+        self.returns = RollingWindow(periods["volatility"])
+        self.ema_fast = RunningEMA(2.0 / (fast + 1))
+        self.ema_slow = RunningEMA(2.0 / (slow + 1))
+        self.macd_signal = RunningEMA(2.0 / (signal + 1))
+        self.avg_gain = RunningEMA(1.0 / periods["rsi"])
+        self.avg_loss = RunningEMA(1.0 / periods["rsi"])
+        self.atr = RunningEMA(1.0 / periods["atr"])
+        self._committed = None
+
+    _ROLLING = ("sma_short", "sma_long", "bollinger", "returns", "ema_fast", "ema_slow", "macd_signal", "avg_gain", "avg_loss", "atr")
+
+    def _save(self):
+        saved = {name: getattr(self, name).copy() for name in self._ROLLING}
+        saved["close"] = self.close
+        return saved
+
+    def _restore(self, saved):
+        for name, value in saved.items():
+            setattr(self, name, value.copy() if name in self._ROLLING else value)
+
+    def update(self, date, open_, high, low, close, volume=None):
+        """Apply one bar; returns False for bars older than the newest one already applied"""
+        if close is None or math.isnan(close) or (self.last_date is not None and date < self.last_date):
+            return False
+        bar = (date, open_, high, low, close, volume)
+        if bar == self.last_bar:
+            return True
+        if date == self.last_date:
+            self._restore(self._committed)
+        else:
+            self._committed = self._save()
+
+        high = close if high is None or math.isnan(high) else high
+        low = close if low is None or math.isnan(low) else low
+        previous = self.close
+        if previous is None:
+            true_range = high - low
+        else:
+            delta = close - previous
+            self.avg_gain.push(max(delta, 0.0))
+            self.avg_loss.push(max(-delta, 0.0))
+            if previous > 0 and close > 0:
+                self.returns.push(math.log(close / previous))
+            true_range = max(high - low, abs(high - previous), abs(low - previous))
+        self.atr.push(true_range)
+
+        for window in (self.sma_short, self.sma_long, self.bollinger):
+            window.push(close)
+        self.ema_fast.push(close)
+        self.ema_slow.push(close)
+        if self.ema_slow.count >= self.periods["macd"][1]:
+            self.macd_signal.push(self.ema_fast.value - self.ema_slow.value)
+
+        self.close = close
+        self.last_date = date
+        self.last_bar = bar
+        return True
+
+    def snapshot(self):
+        """Latest values, keyed like latest_indicators; None where history is still too short"""
+        fast, slow, signal = self.periods["macd"]
+        bollinger_width = self.periods["bollinger"][1]
+
+        rsi_value = None
+        avg_gain = self.avg_gain.current(self.periods["rsi"])
+        if avg_gain is not None:
+            avg_loss = self.avg_loss.value
+            rsi_value = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+
+        macd_line = None
+        if self.ema_slow.count >= slow:
+            macd_line = self.ema_fast.value - self.ema_slow.value
+        macd_signal = self.macd_signal.current(signal)
+
+        bb_lower = bb_middle = bb_upper = None
+        if self.bollinger.full:
+            bb_middle = self.bollinger.mean
+            spread = bollinger_width * math.sqrt(self.bollinger.variance())
+            bb_lower, bb_upper = bb_middle - spread, bb_middle + spread
+
+        volatility = None
+        if self.returns.full and self.returns.n > 1:
+            volatility = math.sqrt(self.returns.variance(ddof=1)) * math.sqrt(TRADING_DAYS_PER_YEAR)
+
+        return {
+            "close": self.close,
+            "sma_short": self.sma_short.mean if self.sma_short.full else None,
+            "sma_long": self.sma_long.mean if self.sma_long.full else None,
+            "ema_fast": self.ema_fast.current(fast),
+            "ema_slow": self.ema_slow.current(slow),
+            "rsi": rsi_value,
+            "macd": macd_line,
+            "macd_signal": macd_signal,
+            "macd_hist": macd_line - macd_signal if macd_signal is not None else None,
+            "bb_lower": bb_lower,
+            "bb_middle": bb_middle,
+            "bb_upper": bb_upper,
+            "atr": self.atr.current(self.periods["atr"]),
+            "volatility": volatility,
+        }
+
+def indicator_states(bars, last_bars, periods=INDICATOR_PERIODS):
+    """IndicatorStates for a bar matrix, as if each row's bars had been fed through update().
+
+    The running averages come from the vectorized series in one pass over all
+    rows; only the rolling windows' last few values are copied per row.
+    last_bars holds each row's newest raw (date, open, high, low, close,
+    volume) bar, or None for rows without bars.
+    """
+    close, high, low = bars["close"], bars["high"], bars["low"]
+    fast, slow, signal = periods["macd"]
+    bar_counts = (~np.isnan(close)).sum(axis=1)
+
+    with np.errstate(invalid="ignore"):
+        high = np.where(np.isnan(high), close, high)
+        low = np.where(np.isnan(low), close, low)
+        delta = np.diff(close, axis=1)
+        gains = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+        losses = np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None))
+        previous = _front_pad(close[:, :-1], 1)
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+        positive = (close[:, 1:] > 0) & (close[:, :-1] > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(positive, np.log(close[:, 1:] / close[:, :-1]), np.nan)
+    macd_line = ema(close, fast, min_periods=slow) - ema(close, slow)
+
+    # (attribute, alpha, series pushed into it); min_periods=1 keeps the raw running value
+    running = [
+        ("ema_fast", 2.0 / (fast + 1), close),
+        ("ema_slow", 2.0 / (slow + 1), close),
+        ("macd_signal", 2.0 / (signal + 1), macd_line),
+        ("avg_gain", 1.0 / periods["rsi"], gains),
+        ("avg_loss", 1.0 / periods["rsi"], losses),
+        ("atr", 1.0 / periods["atr"], true_range),
+    ]
+    running = [
+        (name, alpha, ema(series, alpha=alpha, min_periods=1)[:, -1], (~np.isnan(series)).sum(axis=1))
+        for name, alpha, series in running
+    ]
+    windows = [("sma_short", close), ("sma_long", close), ("bollinger", close), ("returns", returns)]
+
+    states = []
+    for row, last_bar in enumerate(last_bars):
+        state = IndicatorState(periods)
+        if last_bar is None or not bar_counts[row]:
+            states.append(state)
+            continue
+        for name, alpha, values, counts in running:
+            average = RunningEMA(alpha)
+            if counts[row]:
+                average.value = float(values[row])
+                average.count = int(counts[row])
+            setattr(state, name, average)
+        for name, series in windows:
+            window = getattr(state, name)
+            tail = series[row][~np.isnan(series[row])][-window.n:]
+            if len(tail):
+                window.values = deque(tail.tolist())
+                window.mean = float(tail.mean())
+                window._m2 = float(((tail - tail.mean()) ** 2).sum())
+        state.close = float(close[row, -1])
+        state.last_date = last_bar[0]
+        state.last_bar = tuple(last_bar)
+        states.append(state)
+    return states
+
+class IndicatorTracker:
+    """Keeps an IndicatorState per symbol and feeds it only bars it has not seen.
+
+    Symbols seen for the first time get their state from one vectorized pass
+    over their last INDICATOR_LOOKBACK_BARS stored bars (indicator_states).
+    After that each refresh reads just the newest stored bar onwards, so
+    refreshing a watchlist costs time in proportion to the new bars.
+    """
+
+    def __init__(self, store, lookback=INDICATOR_LOOKBACK_BARS):
+        self.store = store
+        self.lookback = lookback
+        self._states = {}
+        self._lock = threading.Lock()
+        store.on_rewrite.append(self.forget)
+
+    def forget(self, symbol):
+        """Drop a symbol's state so the next refresh replays its (rewritten) history"""
+        with self._lock:
+            self._states.pop(symbol.upper(), None)
+
+    def refresh(self, symbols, sync=True):
+        """Update and return {symbol: snapshot} for symbols that have stored bars"""
+        symbols = [s.upper() for s in dict.fromkeys(symbols)]
+        if sync:
+            self.store.sync(symbols)
+
+        snapshots = {}
+        applied = 0
+        with self._lock:
+            self._build_states([s for s in symbols if s not in self._states])
+            for symbol in symbols:
+                state = self._states.get(symbol)
+                if state is None:
+                    continue
+                bars = self.store.bars(symbol, start=state.last_date)
+                for bar in bars:
+                    state.update(*bar)
+                applied += len(bars)
+                if state.last_date is not None:
+                    self._states[symbol] = state
+                    snapshots[symbol] = state.snapshot()
+        logging.debug(f"Indicator refresh: {len(symbols)} symbols, {applied} bars applied")
+        return snapshots
+
+    def _build_states(self, symbols):
+        """States for new symbols from their stored history; the newest bar is applied
+        through update() so a later revision of it can roll back as usual"""
+        if not symbols:
+            return
+        histories = [self.store.bars(symbol, limit=self.lookback) for symbol in symbols]
+        width = max(self.lookback - 1, 1)
+        bars = {field: np.full((len(symbols), width), np.nan) for field in ("open", "high", "low", "close", "volume")}
+        last_bars = []
+        for row, history in enumerate(histories):
+            earlier = history[:-1]
+            last_bars.append(earlier[-1] if earlier else None)
+            if earlier:
+                values = np.array([bar[1:] for bar in earlier], dtype=float)
+                for i, field in enumerate(("open", "high", "low", "close", "volume")):
+                    bars[field][row, width - len(earlier):] = values[:, i]
+        for symbol, state, history in zip(symbols, indicator_states(bars, last_bars), histories):
+            if history:
+                state.update(*history[-1])
+                self._states[symbol] = state
+
+indicator_tracker = IndicatorTracker(price_store)
+
+def describe_indicators(ind):
+    """Human-readable indicator lines for the basic analysis"""
+    lines = []
+    close = ind["close"]
+    if ind["sma_long"]:
+        gap = (close / ind["sma_long"] - 1) * 100
+        trend = "above" if gap >= 0 else "below"
+        lines.append(f"{'🟢' if gap >= 0 else '🔴'} Price {abs(gap):.1f}% {trend} {INDICATOR_PERIODS['sma_long']}-day average")
+    if ind["sma_short"] and ind["sma_long"]:
+        if ind["sma_short"] >= ind["sma_long"]:
+            lines.append(f"📈 {INDICATOR_PERIODS['sma_short']}-day average over {INDICATOR_PERIODS['sma_long']}-day: uptrend")
+        else:
+            lines.append(f"📉 {INDICATOR_PERIODS['sma_short']}-day average under {INDICATOR_PERIODS['sma_long']}-day: downtrend")
+    if ind["rsi"] is not None:
+        if ind["rsi"] >= 70:
+            state = "overbought"
+        elif ind["rsi"] <= 30:
+            state = "oversold"
+        else:
+            state = "neutral"
+        lines.append(f"💪 RSI({INDICATOR_PERIODS['rsi']}): {ind['rsi']:.0f} ({state})")
+    if ind["macd_hist"] is not None:
+        lines.append(f"〰️ MACD: {'bullish' if ind['macd_hist'] >= 0 else 'bearish'} ({ind['macd']:+.2f} vs signal {ind['macd_signal']:+.2f})")
+    if ind["bb_upper"] is not None and ind["bb_upper"] > ind["bb_lower"]:
+        position = (close - ind["bb_lower"]) / (ind["bb_upper"] - ind["bb_lower"]) * 100
+        lines.append(f"🎯 Bollinger position: {position:.0f}% (${ind['bb_lower']:.2f} - ${ind['bb_upper']:.2f})")
+    if ind["atr"] is not None:
+        lines.append(f"📏 ATR({INDICATOR_PERIODS['atr']}): ${ind['atr']:.2f} ({ind['atr'] / close * 100:.1f}% of price)")
+    if ind["volatility"] is not None:
+        lines.append(f"🌊 Volatility ({INDICATOR_PERIODS['volatility']}d, annualized): {ind['volatility'] * 100:.0f}%")
+    return lines
+
+def format_indicator_prompt(ind):
+    """Compact indicator lines for the AI prompt (few tokens, no emoji)"""
+    lines = []
+    if ind["sma_long"]:
+        lines.append(f"vs {INDICATOR_PERIODS['sma_long']}d SMA: {(ind['close'] / ind['sma_long'] - 1) * 100:+.1f}%")
+    if ind["rsi"] is not None:
+        lines.append(f"RSI: {ind['rsi']:.0f}")
+    if ind["macd_hist"] is not None:
+        lines.append(f"MACD: {'bullish' if ind['macd_hist'] >= 0 else 'bearish'}")
+    if ind["volatility"] is not None:
+        lines.append(f"Volatility: {ind['volatility'] * 100:.0f}%/yr")
+    return "\n".join(lines)
+
+def get_ticker_info(symbol):
+    """Raw yfinance .info dict, shared through the cache by every caller"""
+    info = data_cache.get(symbol, "info")
+    if info is None:
+        info = yf.Ticker(symbol).info or {}
+        data_cache.set(symbol, "info", info)
+    return info
+
+def fetch_bulk_info(tickers, max_workers=HOLDINGS_INFO_WORKERS):
+    """Fetch .info for every ticker in parallel; failed lookups map to None"""
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+
+    def fetch_info(ticker):
+        try:
+            return get_ticker_info(ticker)
+        except Exception as e:
+            logging.error(f"Error fetching info for {ticker}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as pool:
+        return dict(zip(tickers, pool.map(fetch_info, tickers)))
+
+def fetch_concurrently(func, items, max_workers=QUOTE_FETCH_WORKERS, timeout=QUOTE_FETCH_TIMEOUT):
+    """Run func over items on a bounded thread pool and return results in input order.
+
+    A slot holds the exception instead of a value when func raised or ran
+    longer than timeout seconds (counted from when that item started).
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(max_workers, len(items)))
+    started = {}
+
+    def run(index, item):
+        started[index] = time.monotonic()
+        return func(item)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = [pool.submit(run, index, item) for index, item in enumerate(items)]
+    # Items still queued behind hung workers give up once every wave has had its turn
+    batch_deadline = time.monotonic() + timeout * math.ceil(len(items) / workers)
+    results = []
+    try:
+        for index, future in enumerate(futures):
+            while True:
+                begun = started.get(index)
+                if begun is None:
+                    wait_for = min(timeout, batch_deadline - time.monotonic())
+                else:
+                    wait_for = begun + timeout - time.monotonic()
+                try:
+                    results.append(future.result(timeout=max(wait_for, 0)))
+                except FuturesTimeout:
+                    # Still queued, or started while we waited and now runs on its own clock
+                    if begun is None and (index in started or time.monotonic() < batch_deadline):
+                        continue
+                    future.cancel()
+                    results.append(TimeoutError(f"Timed out after {timeout}s"))
+                except Exception as e:
+                    results.append(e)
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+    return results
+
+def market_timezone():
+    """US/Eastern, or a fixed UTC-5 stand-in when the tz database is missing"""
+    global _market_tz
+    if _market_tz is None:
+        try:
+            _market_tz = ZoneInfo(MARKET_TIMEZONE)
+        except (ZoneInfoNotFoundError, ValueError):
+            logging.warning(f"Time zone {MARKET_TIMEZONE} not found (pip install tzdata); assuming UTC-5")
+            _market_tz = timezone(timedelta(hours=-5))
+    return _market_tz
+
+_market_tz = None
+
+def market_session(now=None):
+    """The MARKET_SESSIONS name for now ("pre_market", "open", "after_hours") or "closed"; holidays are not modelled"""
+    now = (now or datetime.now(timezone.utc)).astimezone(market_timezone())
+    if now.weekday() >= 5:
+        return "closed"
+    minutes = now.hour * 60 + now.minute
+    for session, (start, end) in MARKET_SESSIONS.items():
+        if start <= minutes < end:
+            return session
+    return "closed"
+
+def seconds_until_market_activity(now=None):
+    """Seconds until the next weekday pre-market opens"""
+    now = (now or datetime.now(timezone.utc)).astimezone(market_timezone())
+    start_minutes = MARKET_SESSIONS["pre_market"][0]
+    day = now.replace(hour=start_minutes // 60, minute=start_minutes % 60, second=0, microsecond=0)
+    while day <= now or day.weekday() >= 5:
+        day += timedelta(days=1)
+    return (day - now).total_seconds()
+
+def latest_quotes(symbols):
+    """Quote dicts ({c, pc, h, l}, like quote_from_history) for symbols from the price store, without syncing"""
+    symbols, bars = price_store.bar_matrix(symbols, limit=2, sync=False)
+    close = bars["close"]
+    previous = np.where(np.isnan(close[:, -2]), close[:, -1], close[:, -2])
+    quotes = {}
+    for row in np.flatnonzero(~np.isnan(close[:, -1])):
+        quotes[symbols[row]] = {
+            "c": float(close[row, -1]),
+            "pc": float(previous[row]),
+            "h": float(bars["high"][row, -1]),
+            "l": float(bars["low"][row, -1]),
+        }
+    return quotes
+
+class QuotePoller:
+    """Background thread that keeps quotes for the visible symbols fresh.
+
+    Each tick is one bulk price-store sync for everything get_symbols()
+    returns, and ticks run on this one thread, so at most one fetch is ever
+    in flight. The interval follows the market session (POLL_INTERVALS),
+    polling stops while the market is closed, and failures back off
+    exponentially. on_quotes({symbol: quote}) and on_state(session, delay,
+    errors) are called from the poller thread.
+    """
+
+    def __init__(self, get_symbols, on_quotes, on_state=None):
+        self.get_symbols = get_symbols
+        self.on_quotes = on_quotes
+        self.on_state = on_state
+        self.errors = 0
+        self.last_success = None
+        self._stopping = False
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def poll_now(self):
+        """Fetch as soon as possible, even when the market is closed; repeated calls coalesce"""
+        self._wake.set()
+
+    def next_delay(self, session, now=None):
+        if session == "closed":
+            return min(seconds_until_market_activity(now), POLL_CLOSED_RECHECK)
+        interval = POLL_INTERVALS[session]
+        if self.errors:
+            interval = min(interval * POLL_BACKOFF_FACTOR ** self.errors, POLL_BACKOFF_MAX)
+        return interval
+
+    def _run(self):
+        forced = False
+        while not self._stopping:
+            session = market_session()
+            if forced or session != "closed":
+                self.tick()
+            delay = self.next_delay(session)
+            if self.on_state:
+                self.on_state(session, delay, self.errors)
+            forced = self._wake.wait(delay)
+            self._wake.clear()
+
+    def tick(self):
+        symbols = list(dict.fromkeys(symbol for symbol in self.get_symbols() if symbol))
+        if not symbols:
+            return
+        try:
+            if not price_store.sync(symbols, force=True):
+                raise RuntimeError("no bars returned")
+            quotes = latest_quotes(symbols)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Quote poll for {len(symbols)} symbols failed ({self.errors} in a row): {e}")
+            return
+        for symbol, quote in quotes.items():
+            data_cache.set(symbol, "quote", quote)
+        self.errors = 0
+        self.last_success = time.time()
+        self.on_quotes(quotes)
+
+def format_holdings_price(price):
+    return f"${price:.2f}" if price else "N/A"
+
+def get_buffett_top_holdings_data(watchlist=()):
+    """Rows for the holdings table: Buffett's top 15, then watchlist symbols marked with a star"""
     tickers = get_dataroma_portfolio("BRK") or [
         "AAPL", "AXP", "BAC", "KO", "CVX", "OXY", "MCO", "KHC", "CB", "DVA", "V", "AMZN"
     ]
+    tickers = tickers[:15]
+    watched = [symbol for symbol in dict.fromkeys(watchlist) if symbol not in tickers]
+    tickers = tickers + watched
+    price_store.sync(tickers)
+    infos = fetch_bulk_info(tickers)
+
     data = []
-    for ticker in tickers[:15]:
+    for ticker in tickers:
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info or {}
-            hist = stock.history(period="2d")
-            price = info.get("currentPrice", hist["Close"].iloc[-1] if not hist.empty else None)
-            price_str = f"${price:.2f}" if price else "N/A"
+            info = infos.get(ticker)
+            hist = price_store.history(ticker, limit=2, sync=False)
+            if info is None and hist is None:
+                raise ValueError(f"No data returned for {ticker}")
+            info = info or {}
+            if hist is not None:
+                data_cache.set(ticker, "quote", quote_from_history(hist))
+            # The stored close is what the quote poller keeps updating; .info can be hours old
+            price = hist["Close"].iloc[-1] if hist is not None else info.get("currentPrice")
+            price_str = format_holdings_price(price)
             pe_ratio = info.get("trailingPE", info.get("forwardPE"))
             pe_str = f"{pe_ratio:.2f}" if pe_ratio and pe_ratio > 0 else "N/A"
             market_cap = info.get("marketCap")
             cap_str = f"${market_cap/1e9:.2f}B" if market_cap and market_cap >= 1e9 else "N/A"
             company_name = info.get("shortName", ticker)[:20]
+            if ticker in watched:
+                company_name = "⭐ " + company_name
             data.append([ticker, company_name, price_str, pe_str, cap_str])
         except Exception as e:
             data.append([ticker, "Error", "N/A", "N/A", "N/A"])
     return data
 
-class StockAnalyzer:
-    def __init__(self):
-        print("🔧 Initializing Stock Analyzer...")
-        self.model = None
-        self.model_loading = False
-        self.model_loaded = False
-        
-        try:
-            print("🎨 Setting up user interface...")
-            self.setup_ui()
-            print("✅ UI setup complete")
-            
-            print("🤖 Starting model loading...")
-            self.load_model()
-            print("✅ Initialization complete")
-            
-        except Exception as e:
-            print(f"❌ Error during initialization: {e}")
-            import traceback
-            traceback.print_exc()
-            raise
+# Model settings: the JSON file is read first, then VERISS_* environment variables,
+# then command-line flags; anything still unset is chosen from the machine's cores and RAM
+MODEL_CONFIG_PATH = "veriss_config.json"
+MODEL_CONFIG_ENV = {
+    "model": "VERISS_MODEL",
+    "n_threads": "VERISS_N_THREADS",
+    "n_ctx": "VERISS_N_CTX",
+    "n_batch": "VERISS_N_BATCH",
+    "device": "VERISS_DEVICE",
+}
 
-    def load_model(self):
-        if self.model_loading:
-            return
-            
+# Common model paths for development environment, plus any .gguf dropped into models/
+DEFAULT_MODEL_PATHS = [
+    "models/orca-mini-3b-gguf2-q4_0.gguf",
+    "models/mistral-7b-openorca.Q4_0.gguf",
+    "models/nous-hermes-llama2-13b.Q4_0.gguf",
+    os.path.join(os.path.expanduser("~"), ".cache", "gpt4all", "orca-mini-3b-gguf2-q4_0.gguf"),
+    os.path.join(os.path.expanduser("~"), "Documents", "GPT4All", "orca-mini-3b-gguf2-q4_0.gguf"),
+]
+
+def available_memory_bytes():
+    """RAM currently available to a new process, or None when it can't be determined"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return None
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def choose_model_path(candidates, cores, memory_bytes):
+    """Largest local model that fits in RAM and that the core count can run interactively.
+
+    A quantized model needs roughly its file size plus ~1 GB of working memory,
+    and stays responsive on CPU with about one core per GB of weights.
+    """
+    sizes = {}
+    for path in candidates:
+        if os.path.isfile(path):
+            sizes[path] = os.path.getsize(path)
+    if not sizes:
+        return None
+
+    gb = 1024 ** 3
+    fitting = [
+        path for path, size in sizes.items()
+        if (memory_bytes is None or size + gb <= memory_bytes) and size / gb <= max(cores, 1)
+    ]
+    if fitting:
+        return max(fitting, key=sizes.get)
+    return min(sizes, key=sizes.get)
+
+class ModelConfig:
+    """Resolved GPT4All settings: model file, device, threads, context and batch size"""
+
+    def __init__(self, model=None, device="cpu", n_threads=None, n_ctx=None, n_batch=None):
+        self.model = model
+        self.device = device
+        self.n_threads = n_threads
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+
+    def describe(self):
+        return (
+            f"model={self.model}, device={self.device}, n_threads={self.n_threads}, "
+            f"n_ctx={self.n_ctx}, n_batch={self.n_batch}"
+        )
+
+def load_model_config(path=MODEL_CONFIG_PATH, overrides=None):
+    """Merge config file, environment and CLI overrides, then fill the gaps automatically"""
+    settings = {}
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                settings.update({k: v for k, v in json.load(f).items() if k in MODEL_CONFIG_ENV})
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read model config {path}: {e}")
+    for key, env_name in MODEL_CONFIG_ENV.items():
+        if os.environ.get(env_name):
+            settings[key] = os.environ[env_name]
+    settings.update({k: v for k, v in (overrides or {}).items() if v is not None})
+
+    for key in ("n_threads", "n_ctx", "n_batch"):
+        if settings.get(key) is not None:
+            settings[key] = int(settings[key])
+
+    cores = os.cpu_count() or 1
+    memory = available_memory_bytes()
+    config = ModelConfig(**settings)
+    if not config.model:
+        candidates = DEFAULT_MODEL_PATHS + sorted(glob.glob(os.path.join("models", "*.gguf")))
+        config.model = choose_model_path(list(dict.fromkeys(candidates)), cores, memory)
+    if config.n_threads is None:
+        # llama.cpp scales with physical cores; assume two hardware threads per core
+        config.n_threads = max(1, cores // 2) if cores >= 4 else cores
+    if config.n_ctx is None:
+        # Analysis prompts plus 200 generated tokens stay well under 1k tokens
+        config.n_ctx = 2048 if memory is None or memory >= 8 * 1024 ** 3 else 1024
+    if config.n_batch is None:
+        config.n_batch = 128 if cores >= 8 else 64
+    config.n_batch = min(config.n_batch, config.n_ctx)
+    return config
+
+def measure_tokens_per_second(model, n_batch=8, max_tokens=16):
+    """Short timed generation used to log how fast the loaded model runs on this machine"""
+    start = time.perf_counter()
+    count = sum(1 for _ in model.generate("The stock market is", max_tokens=max_tokens, temp=0.1, n_batch=n_batch, streaming=True))
+    elapsed = time.perf_counter() - start
+    return count / elapsed if elapsed > 0 else 0.0
+
+class PromptPrefixCache:
+    """Keeps a fixed prompt prefix evaluated in the model's KV cache between generations.
+
+    The prefix is ingested once through the gpt4all backend; before each request
+    the prompt context is rewound to the end of the prefix (n_past), so only the
+    request-specific suffix is evaluated. Any other use of the model overwrites
+    that state, so callers must invalidate() afterwards.
+    """
+
+    def __init__(self, model, prefix):
+        self.model = model
+        self.prefix = prefix
+        self.prefix_n_past = None
+
+    @property
+    def _backend(self):
+        backend = getattr(self.model, "model", None)
+        if backend is None or not hasattr(backend, "prompt_model"):
+            raise RuntimeError("gpt4all backend does not expose prompt_model")
+        return backend
+
+    def warm_up(self):
+        """Evaluate the prefix once; returns False when this gpt4all build can't reuse it"""
+        try:
+            backend = self._backend
+            backend.prompt_model(self.prefix, "%1", lambda token_id, response: True, n_predict=0, reset_context=True)
+            n_past = backend.context.n_past
+        except Exception as e:
+            logging.warning(f"Prompt prefix caching unavailable: {e}")
+            self.prefix_n_past = None
+            return False
+        self.prefix_n_past = n_past if n_past > 0 else None
+        return self.prefix_n_past is not None
+
+    def invalidate(self):
+        self.prefix_n_past = None
+
+    def generate(self, suffix, on_token=None, max_tokens=200, temp=0.7, top_k=40, top_p=0.4,
+                 repeat_penalty=1.18, repeat_last_n=64, n_batch=8):
+        if self.prefix_n_past is None and not self.warm_up():
+            raise RuntimeError("Prompt prefix is not cached")
+
+        backend = self._backend
+        backend.context.n_past = self.prefix_n_past
+        tokens = []
+
+        def on_response(token_id, response):
+            tokens.append(response)
+            if on_token:
+                on_token(response)
+            return True
+
+        backend.prompt_model(
+            suffix,
+            "%1",
+            on_response,
+            n_predict=max_tokens,
+            top_k=top_k,
+            top_p=top_p,
+            temp=temp,
+            n_batch=n_batch,
+            repeat_penalty=repeat_penalty,
+            repeat_last_n=repeat_last_n,
+            reset_context=False,
+        )
+        return "".join(tokens)
+
+class InferenceRequest:
+    def __init__(self, key, prompt, priority, gen_kwargs):
+        self.key = key
+        self.prompt = prompt
+        self.priority = priority
+        self.gen_kwargs = gen_kwargs
+        self.token_listeners = []
+        self.future = Future()
+
+class InferenceWorker:
+    """Dedicated thread that owns the GPT4All model and runs queued prompts one at a time.
+
+    Requests carry a key (normally the symbol). Submitting an identical prompt
+    for a key that is still queued returns the queued request's future, moving
+    it up if the new submission has a better priority; a different prompt for
+    that key cancels the stale one.
+    """
+
+    def __init__(self, loader):
+        self.model = None
+        self.prefix_cache = None
+        self.generation_defaults = {}
+        self.busy = False
+        self.ready = threading.Event()
+        self._loader = loader
+        self._queue = queue.PriorityQueue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._thread = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, key, prompt, priority=PRIORITY_INTERACTIVE, on_token=None, **gen_kwargs):
+        """Queue a prompt; on_token, if given, is called from the worker with each new token"""
+        with self._lock:
+            queued = self._pending.get(key)
+            if queued is not None:
+                if queued.prompt == prompt and queued.gen_kwargs == gen_kwargs:
+                    if on_token:
+                        queued.token_listeners.append(on_token)
+                    if priority < queued.priority:
+                        # Queue it again at the better priority; _run skips the old entry
+                        queued.priority = priority
+                        self._queue.put((priority, next(self._seq), queued))
+                    return queued.future
+                queued.future.cancel()
+                logging.debug(f"Cancelled stale inference request for {key}")
+
+            request = InferenceRequest(key, prompt, priority, gen_kwargs)
+            if on_token:
+                request.token_listeners.append(on_token)
+            self._pending[key] = request
+            self._queue.put((priority, next(self._seq), request))
+            return request.future
+
+    def queue_depth(self):
+        """Requests waiting for the model, not counting the one being generated"""
+        with self._lock:
+            return sum(1 for request in self._pending.values() if not request.future.cancelled())
+
+    def stop(self):
+        self._queue.put((float("inf"), next(self._seq), None))
+
+    def _run(self):
+        try:
+            self.model = self._loader()
+        finally:
+            self.ready.set()
+
+        while True:
+            priority, _, request = self._queue.get()
+            if request is None:
+                break
+            if priority != request.priority:
+                continue  # superseded by a higher-priority entry for the same request
+            with self._lock:
+                if self._pending.get(request.key) is request:
+                    del self._pending[request.key]
+            if not request.future.set_running_or_notify_cancel():
+                continue
+
+            self.busy = True
+            try:
+                if self.model is None:
+                    raise RuntimeError("AI model is not loaded")
+                result = self._generate(request)
+            except Exception as e:
+                self.busy = False
+                request.future.set_exception(e)
+            else:
+                self.busy = False
+                request.future.set_result(result)
+        self.model = None
+
+    def _generate(self, request):
+        listeners = request.token_listeners
+        gen_kwargs = dict(self.generation_defaults, **request.gen_kwargs)
+
+        def emit(token):
+            for listener in listeners:
+                try:
+                    listener(token)
+                except Exception as e:
+                    logging.error(f"Token listener failed: {e}")
+
+        prefix_cache = self.prefix_cache
+        if prefix_cache is not None and request.prompt.startswith(prefix_cache.prefix):
+            emitted = []
+            try:
+                return prefix_cache.generate(
+                    request.prompt[len(prefix_cache.prefix):],
+                    on_token=lambda token: (emitted.append(token), emit(token)),
+                    **gen_kwargs,
+                )
+            except Exception as e:
+                if emitted:
+                    raise
+                logging.warning(f"Prompt prefix reuse failed, using full prompts from now on: {e}")
+                self.prefix_cache = None
+        elif prefix_cache is not None:
+            # A full prompt overwrites the cached prefix state
+            prefix_cache.invalidate()
+
+        if not listeners:
+            return self.model.generate(request.prompt, **gen_kwargs)
+
+        tokens = []
+        for token in self.model.generate(request.prompt, streaming=True, **gen_kwargs):
+            tokens.append(token)
+            emit(token)
+        return "".join(tokens)
+
+def read_symbol_file(path):
+    """Symbols from a text file: separated by commas or whitespace, '#' starts a comment"""
+    symbols = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            symbols.extend(part.strip().upper() for part in re.split(r"[,\s]+", line) if part.strip())
+    return symbols
+
+def resolve_symbol_list(spec):
+    """Turn a screen target into symbols: "watchlist", a file path, an investor name or a symbol list"""
+    spec = spec.strip()
+    if spec.lower() == "watchlist":
+        return read_symbol_file(WATCHLIST_PATH) if os.path.exists(WATCHLIST_PATH) else []
+    if os.path.isfile(spec):
+        return read_symbol_file(spec)
+    investor_code = resolve_name_to_dataroma_code(spec)
+    if investor_code:
+        return get_dataroma_holdings(investor_code)
+    return [part.upper() for part in re.split(r"[,\s]+", spec) if part]
+
+def parse_recommendation(analysis):
+    """Final BUY/HOLD/SELL call in an analysis text, or N/A when the model didn't make one"""
+    calls = re.findall(r"\b(BUY|HOLD|SELL)\b", analysis or "")
+    if not calls:
+        calls = re.findall(r"recommend\w*\W+(?:\w+\W+){0,3}?(buy|hold|sell)\b", analysis or "", re.IGNORECASE)
+    return calls[-1].upper() if calls else "N/A"
+
+# BUY first, SELL last; within a group the strongest daily move leads
+RECOMMENDATION_RANK = {"BUY": 0, "HOLD": 1, "SELL": 2, "N/A": 3}
+
+def rank_screen_results(rows):
+    return sorted(rows, key=lambda row: (RECOMMENDATION_RANK.get(row["recommendation"], 3), -(row["change"] or 0)))
+
+def format_screen_table(rows):
+    lines = [f"{'#':>3s}  {'Symbol':7s} {'Call':5s} {'Price':>10s} {'Change':>8s}  Company"]
+    for i, row in enumerate(rows, 1):
+        price = f"${row['price']:.2f}" if row["price"] is not None else "N/A"
+        change = f"{row['change']:+.1f}%" if row["change"] is not None else "N/A"
+        lines.append(f"{i:3d}. {row['symbol']:7s} {row['recommendation']:5s} {price:>10s} {change:>8s}  {row['name'][:24]}")
+    return "\n".join(lines)
+
+def write_screen_csv(rows, directory=SCREEN_OUTPUT_DIR):
+    """Save a ranked screen under directory and return the file path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"screen_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "symbol", "recommendation", "price", "change_pct", "name", "sector", "analysis"])
+        for i, row in enumerate(rows, 1):
+            writer.writerow([
+                i, row["symbol"], row["recommendation"],
+                "" if row["price"] is None else f"{row['price']:.2f}",
+                "" if row["change"] is None else f"{row['change']:.2f}",
+                row["name"], row["sector"], row["analysis"],
+            ])
+    return path
+
+class ScreenerTable:
+    """Quote, fundamental and indicator fields for a ticker universe, one NumPy array per column.
+
+    Numeric columns are float arrays with NaN for missing data, so filter
+    expressions run over the whole table at once and rows with missing
+    values simply don't match.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = np.array(symbols, dtype=object)
+        self.columns = {"symbol": self.symbols}
+        self.built_at = None
+        self.quotes_at = None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def load_fundamentals(self, infos, holdings_index=None):
+        """Fill the .info and holdings columns from {symbol: info dict}"""
+        symbols = list(self.symbols)
+        rows = [infos.get(symbol) or {} for symbol in symbols]
+        self.columns["name"] = np.array([info.get("shortName", info.get("longName", symbol)) or symbol for symbol, info in zip(symbols, rows)], dtype=object)
+        self.columns["sector"] = np.array([info.get("sector") or "Unknown" for info in rows], dtype=object)
+        for column, keys in SCREENER_INFO_FIELDS.items():
+            self.columns[column] = np.array([_first_number(info, keys) for info in rows], dtype=float)
+        if holdings_index is not None:
+            self.columns["holders"] = np.array([len(holdings_index.holders_of(symbol)) for symbol in symbols], dtype=float)
+        self.built_at = time.time()
+
+    def refresh_quotes(self, sync=True):
+        """Recompute the price columns from the last two stored bars and update indicators"""
+        symbols = list(self.symbols)
+        if sync:
+            price_store.sync(symbols)
+        _, bars = price_store.bar_matrix(symbols, limit=2, sync=False)
+        close = bars["close"]
+        self.columns["price"] = close[:, -1]
+        self.columns["prev_close"] = close[:, -2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.columns["change"] = (close[:, -1] / close[:, -2] - 1) * 100
+        self.columns["high"] = bars["high"][:, -1]
+        self.columns["low"] = bars["low"][:, -1]
+        self.columns["volume"] = bars["volume"][:, -1]
+
+        indicators = indicator_tracker.refresh(symbols, sync=False)
+        snapshots = [indicators.get(symbol) or {} for symbol in symbols]
+        self.columns["rsi"] = np.array([snapshot.get("rsi") for snapshot in snapshots], dtype=float)
+        self.columns["volatility"] = np.array([snapshot.get("volatility") for snapshot in snapshots], dtype=float) * 100
+        sma_long = np.array([snapshot.get("sma_long") for snapshot in snapshots], dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.columns["vs_sma"] = (self.columns["price"] / sma_long - 1) * 100
+        self.quotes_at = time.time()
+
+    def evaluate(self, expression):
+        return evaluate_screen_expression(expression, self.columns, len(self))
+
+    def query(self, where=None, sort=None, descending=False, limit=None):
+        """Indices of rows matching `where`, ordered by the `sort` expression (missing values last)"""
+        if where:
+            selected = np.flatnonzero(_as_mask(self.evaluate(where), len(self)))
+        else:
+            selected = np.arange(len(self))
+        if sort and len(selected):
+            keys = np.broadcast_to(self.evaluate(sort), (len(self),))[selected]
+            if keys.dtype.kind in "fiub":
+                keys = keys.astype(float)
+                order = np.argsort(-keys if descending else keys, kind="stable")
+            else:
+                order = np.argsort(keys.astype(str), kind="stable")
+                if descending:
+                    order = order[::-1]
+            selected = selected[order]
+        return selected[:limit] if limit else selected
+
+    def rows(self, indices):
+        """Plain dicts for the given rows, with None for missing numbers"""
+        result = []
+        for i in indices:
+            row = {}
+            for column, values in self.columns.items():
+                value = values[i]
+                if isinstance(value, float) or values.dtype.kind == "f":
+                    value = None if math.isnan(value) else float(value)
+                row[column] = value
+            result.append(row)
+        return result
+
+def _first_number(info, keys):
+    for key in keys:
+        value = info.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    return math.nan
+
+def _known(values, length):
+    """True where a value is present: NaN marks missing numbers, other values always count"""
+    values = np.asarray(values)
+    if values.dtype.kind != "f":
+        return np.ones(length, dtype=bool)
+    return np.broadcast_to(~np.isnan(values), (length,))
+
+def _as_mask(values, length):
+    values = np.asarray(values)
+    if values.dtype != bool:
+        raise ValueError("Filter must be a condition, e.g. pe < 15 and change > 0")
+    return np.broadcast_to(values, (length,))
+
+_SCREEN_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_SCREEN_COMPARE_OPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+def evaluate_screen_expression(expression, columns, length):
+    """Evaluate a filter or sort expression over whole columns at once.
+
+    Allowed: column names, numbers, quoted strings, + - * /, comparisons
+    (chained too), `in [...]`, and/or/not, abs() and parentheses. Anything
+    else, such as attribute access or other calls, raises ValueError.
+    Missing (NaN) values never match, also under != and `not`: a negated
+    condition only matches rows where every column it uses is present.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Could not parse '{expression}': {e.msg}")
+
+    def evaluate(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+            return node.value
+        if isinstance(node, ast.Name):
+            column = node.id.lower()
+            if column not in columns:
+                raise ValueError(f"Unknown column '{node.id}'. Available: {', '.join(columns)}")
+            return columns[column]
+        if isinstance(node, ast.BoolOp):
+            masks = [_as_mask(evaluate(value), length) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return combine.reduce(masks)
+        if isinstance(node, ast.UnaryOp):
+            operand = evaluate(node.operand)
+            if isinstance(node.op, ast.Not):
+                known = np.ones(length, dtype=bool)
+                for name in ast.walk(node.operand):
+                    # Function names such as abs are Name nodes too
+                    if isinstance(name, ast.Name) and name.id.lower() in columns:
+                        known &= _known(columns[name.id.lower()], length)
+                return ~_as_mask(operand, length) & known
+            if isinstance(node.op, ast.USub):
+                return -operand
+            if isinstance(node.op, ast.UAdd):
+                return +operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _SCREEN_BINARY_OPS:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return _SCREEN_BINARY_OPS[type(node.op)](evaluate(node.left), evaluate(node.right))
+        if isinstance(node, ast.Compare):
+            result = None
+            left = evaluate(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    if not isinstance(comparator, (ast.List, ast.Tuple)):
+                        raise ValueError("'in' needs a list, e.g. sector in ['Energy', 'Technology']")
+                    right = [evaluate(element) for element in comparator.elts]
+                    outcome = np.isin(left, right)
+                    if isinstance(op, ast.NotIn):
+                        outcome = ~outcome & _known(left, length)
+                elif type(op) in _SCREEN_COMPARE_OPS:
+                    right = evaluate(comparator)
+                    try:
+                        outcome = _SCREEN_COMPARE_OPS[type(op)](left, right)
+                    except TypeError:
+                        raise ValueError(f"Cannot compare text with numbers in '{expression}'")
+                    if isinstance(op, ast.NotEq):
+                        outcome = outcome & _known(left, length) & _known(right, length)
+                else:
+                    break
+                outcome = _as_mask(outcome, length)
+                result = outcome if result is None else result & outcome
+                left = right
+            else:
+                return result
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "abs" and len(node.args) == 1 and not node.keywords:
+            return np.abs(evaluate(node.args[0]))
+        raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+    return evaluate(tree.body)
+
+_SCREEN_QUERY_RE = re.compile(
+    r"^(?P<where>.*?)(?:\s*\bsort\s+by\s+(?P<sort>.+?)(?:\s+(?P<order>asc|desc))?)?(?:\s*\blimit\s+(?P<limit>\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+def parse_screen_query(text):
+    """Split "pe < 15 and change > 0 sort by market_cap desc limit 20" into its parts"""
+    match = _SCREEN_QUERY_RE.match(text.strip())
+    return {
+        "where": match.group("where").strip() or None,
+        "sort": (match.group("sort") or "").strip() or None,
+        "descending": (match.group("order") or "").lower() == "desc",
+        "limit": int(match.group("limit")) if match.group("limit") else None,
+    }
+
+def screen_expression_columns(expression, columns):
+    """Column names an expression refers to, in order of first use"""
+    if not expression:
+        return []
+    names = [node.id.lower() for node in ast.walk(ast.parse(expression.strip(), mode="eval")) if isinstance(node, ast.Name)]
+    return [name for name in dict.fromkeys(names) if name in columns]
+
+def screener_universe():
+    """Every ticker in a tracked investor portfolio plus the watchlist"""
+    symbols = get_holdings_index().tickers()
+    if os.path.exists(WATCHLIST_PATH):
+        symbols += read_symbol_file(WATCHLIST_PATH)
+    return list(dict.fromkeys(symbols))
+
+def load_screener_fundamentals(symbols, refresh=False):
+    """The .info fields the screener uses, {symbol: dict}, from screener_info_cache where fresh.
+
+    Only tickers missing from the cache (or all of them with refresh) go
+    through a parallel .info pass; failed lookups are left out and retried
+    next time.
+    """
+    keys = ["shortName", "longName", "sector"] + [key for keys in SCREENER_INFO_FIELDS.values() for key in keys]
+    infos = {}
+    missing = []
+    for symbol in symbols:
+        entry = None if refresh else screener_info_cache.get(symbol, max_age=CACHE_TTLS["info"])
+        if entry is None:
+            missing.append(symbol)
+        else:
+            infos[symbol] = entry[0]
+
+    fetched = {
+        symbol: {key: info[key] for key in keys if info.get(key) is not None}
+        for symbol, info in fetch_bulk_info(missing).items() if info
+    }
+    screener_info_cache.set_many(fetched)
+    infos.update(fetched)
+    logging.info(f"Screener fundamentals: {len(symbols) - len(missing)} cached, {len(fetched)} of {len(missing)} downloaded")
+    return infos
+
+def build_screener_table(symbols=None, refresh=False):
+    """Everything the screener needs: cached or freshly downloaded fundamentals plus one bulk price sync"""
+    index = get_holdings_index()
+    symbols = screener_universe() if symbols is None else list(dict.fromkeys(symbols))
+    start = time.time()
+    table = ScreenerTable(symbols)
+    table.load_fundamentals(load_screener_fundamentals(symbols, refresh), index)
+    table.refresh_quotes()
+    logging.info(f"Built screener table: {len(table)} tickers in {time.time() - start:.1f}s")
+    return table
+
+_screener_table = None
+_screener_table_lock = threading.Lock()
+
+def get_screener_table(refresh=False):
+    """Shared ScreenerTable: fundamentals are rebuilt after CACHE_TTLS["info"], quotes after PRICE_REFRESH_INTERVAL.
+
+    refresh re-downloads fundamentals even when screener_info_cache has them.
+    """
+    global _screener_table
+    with _screener_table_lock:
+        now = time.time()
+        if _screener_table is None or refresh or now - _screener_table.built_at >= CACHE_TTLS["info"]:
+            _screener_table = build_screener_table(refresh=refresh)
+        elif now - _screener_table.quotes_at >= PRICE_REFRESH_INTERVAL:
+            _screener_table.refresh_quotes()
+        return _screener_table
+
+def run_screen_query(text, table=None):
+    """Filter and sort the screener table; returns (rows, display columns, total tickers, seconds)"""
+    query = parse_screen_query(text)
+    if table is None:
+        table = get_screener_table()
+    start = time.perf_counter()
+    indices = table.query(query["where"], query["sort"], query["descending"], query["limit"])
+    elapsed = time.perf_counter() - start
+    extra = screen_expression_columns(query["where"], table.columns) + screen_expression_columns(query["sort"], table.columns)
+    columns = list(dict.fromkeys(SCREENER_DISPLAY_COLUMNS + [c for c in extra if c not in ("symbol", "name")]))
+    return table.rows(indices), columns, len(table), elapsed
+
+def format_screener_rows(rows, columns):
+    header = f"{'#':>3s}  {'Symbol':7s} " + " ".join(f"{column[:10]:>10s}" for column in columns) + "  Company"
+    lines = [header]
+    for i, row in enumerate(rows, 1):
+        cells = []
+        for column in columns:
+            value = row.get(column)
+            if value is None:
+                cell = "N/A"
+            elif column == "market_cap":
+                cell = f"${value / 1e9:,.1f}B"
+            elif column in ("change", "vs_sma"):
+                cell = f"{value:+.1f}%"
+            elif column in ("holders", "volume"):
+                cell = f"{value:,.0f}"
+            elif isinstance(value, float):
+                cell = f"{value:,.2f}"
+            else:
+                cell = str(value)[:10]
+            cells.append(f"{cell:>10s}")
+        lines.append(f"{i:3d}. {row['symbol']:7s} " + " ".join(cells) + f"  {row['name'][:24]}")
+    return "\n".join(lines)
+
+def format_analysis_header(symbol, stock_data, company_info):
+    """Company and price section shown above an analysis (GUI and command line)"""
+    result = f"🎯 STOCK ANALYSIS: {symbol}\n"
+    result += "=" * 50 + "\n\n"
+    
+    result += f"📋 COMPANY INFORMATION:\n"
+    result += f"Name: {company_info.get('name', 'Unknown')}\n"
+    result += f"Sector: {company_info.get('sector', 'Unknown')}\n"
+    result += f"Industry: {company_info.get('industry', 'Unknown')}\n"
+    result += f"Country: {company_info.get('country', 'Unknown')}\n\n"
+    
+    result += f"💰 PRICE DATA:\n"
+    result += f"Current Price: ${stock_data['c']:.2f}\n"
+    result += f"Previous Close: ${stock_data['pc']:.2f}\n"
+    daily_change = stock_data['c'] - stock_data['pc']
+    daily_change_percent = (daily_change / stock_data['pc']) * 100
+    result += f"Daily Change: ${daily_change:.2f} ({daily_change_percent:+.2f}%)\n"
+    result += f"Day High: ${stock_data['h']:.2f}\n"
+    result += f"Day Low: ${stock_data['l']:.2f}\n\n"
+    
+    if company_info.get('marketCap'):
+        market_cap = company_info['marketCap']
+        if market_cap >= 1e9:
+            result += f"Market Cap: ${market_cap/1e9:.2f}B\n\n"
+        elif market_cap >= 1e6:
+            result += f"Market Cap: ${market_cap/1e6:.2f}M\n\n"
+    
+    result += f"🤖 ANALYSIS:\n"
+    result += "=" * 30 + "\n"
+    return result
+
+def format_analysis_report(result):
+    """Plain-text report for one AnalysisEngine.analyze() result"""
+    if "error" in result:
+        return f"❌ {result['symbol']}: {result['error']}\n"
+    quote = result["quote"]
+    stock_data = {"c": quote["price"], "pc": quote["previous_close"], "h": quote["high"], "l": quote["low"]}
+    report = format_analysis_header(result["symbol"], stock_data, result["company"])
+    report += result["analysis"] + "\n\n"
+    report += f"Recommendation: {result['recommendation']} ({result['analysis_source']} analysis)\n"
+    return report
+
+class AnalysisEngine:
+    """UI-free analysis core: quotes, company info, basic and AI analysis, screening.
+
+    The Tk app and the command line both drive one of these. on_status(text, color)
+    reports model state changes and on_activity() fires when the AI queue changes;
+    both are called from worker threads.
+    """
+
+    def __init__(self, config_path=MODEL_CONFIG_PATH, model_overrides=None, on_status=None, on_activity=None):
+        self.config_path = config_path
+        self.model_overrides = model_overrides or {}
+        self.model_config = None
+        self.inference = None
+        self.model_path = None
+        self.model_loading = False
+        self.model_loaded = False
+        self.on_status = on_status
+        self.on_activity = on_activity
+
+    def notify_status(self, text, color):
+        if self.on_status:
+            self.on_status(text, color)
+
+    def notify_activity(self):
+        if self.on_activity:
+            self.on_activity()
+
+    def wait_for_model(self, timeout=None):
+        """Block until model loading finished; True when a model is ready for analyses"""
+        if self.inference is None:
+            return False
+        self.inference.ready.wait(timeout)
+        return self.model_loaded
+
+    def shutdown(self):
+        if self.inference is not None:
+            self.inference.stop()
+        dataroma_client.close()
+
+    def load_model(self):
+        if self.model_loading or self.inference is not None:
+            return
+            
         self.model_loading = True
+        self.inference = InferenceWorker(self.load_model_instance)
+        self.inference.start()
+
+    def load_model_instance(self):
+        """Runs on the inference worker thread, which keeps the returned model to itself"""
+        try:
+            config = load_model_config(self.config_path, self.model_overrides)
+            self.model_config = config
+            model_path = config.model if config.model and os.path.exists(config.model) else None
+            
+            if not model_path:
+                if config.model:
+                    print(f"⚠️ Configured model not found: {config.model}")
+                print("⚠️ No local model found. AI analysis will be limited.")
+                self.notify_status("⚠️ No AI Model", "#FFA502")
+                self.model_loaded = False
+                return None
+            
+            self.model_path = model_path
+            print(f"🔄 Loading model: {config.describe()}")
+            logging.info(f"Loading model: {config.describe()}")
+            self.notify_status("🔄 Loading AI Model...", "#FFA502")
+            
+            model = gpt4all.GPT4All(
+                model_path, 
+                allow_download=False, 
+                device=config.device,
+                n_threads=config.n_threads,
+                n_ctx=config.n_ctx,
+            )
+            self.inference.generation_defaults = {"n_batch": config.n_batch}
+
+            tokens_per_second = measure_tokens_per_second(model, n_batch=config.n_batch)
+            print(f"📈 Model speed: {tokens_per_second:.1f} tokens/sec")
+            logging.info(f"Model speed: {tokens_per_second:.1f} tokens/sec ({config.describe()})")
+
+            # Warm up by evaluating the fixed analyst instructions once and keeping them cached
+            print("🧪 Warming up model...")
+            prefix_cache = PromptPrefixCache(model, ANALYST_PROMPT_PREFIX)
+            if prefix_cache.warm_up():
+                self.inference.prefix_cache = prefix_cache
+                print(f"✅ Model warmed up, analyst prompt cached ({prefix_cache.prefix_n_past} tokens)")
+            else:
+                # Older/newer bindings without prompt-context access: plain smoke test
+                test_response = model.generate("Hi", max_tokens=3, temp=0.1)
+                print(f"✅ Model test successful: '{test_response.strip()}'")
         
-        def load_in_background():
-           
-                # Common model paths for development environment
-                possible_paths = [
-                    "models/orca-mini-3b-gguf2-q4_0.gguf",
-                    "models/mistral-7b-openorca.Q4_0.gguf",
-                    "models/nous-hermes-llama2-13b.Q4_0.gguf",
-                    os.path.join(os.path.expanduser("~"), ".cache", "gpt4all", "orca-mini-3b-gguf2-q4_0.gguf"),
-                    os.path.join(os.path.expanduser("~"), "Documents", "GPT4All", "orca-mini-3b-gguf2-q4_0.gguf"),
-                ]
-                
-                model_path = None
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        model_path = path
-                        break
-                
-                if not model_path:
-                    print("⚠️ No local model found. AI analysis will be limited.")
-                    self.window.after(0, lambda: self.update_status("⚠️ No AI Model", "#FFA502"))
-                    self.model_loaded = False
-                    return
-                
-                print(f"🔄 Loading model: {model_path}")
-                self.window.after(0, lambda: self.update_status("🔄 Loading AI Model...", "#FFA502"))
-                
-                # Load with more conservative settings for stability
-                self.model = GPT4All(
-                    model_path, 
-                    allow_download=False, 
-                    device='cpu',
-                )
-                try:    
-                    # Test the model with very simple prompt
-                    print("🧪 Testing model...")
-                    test_response = self.model.generate("Hi", max_tokens=3, temp=0.1)
-                    print(f"✅ Model test successful: '{test_response.strip()}'")
-                
-                    self.model_loaded = True
-                    self.window.after(0, lambda: self.update_status("✅ AI Model Ready!", "#00D084"))
-                
-                except Exception as e:
-                    print(f"❌ Model loading error: {e}")
-                    print("Full traceback:")
-                    traceback.print_exc()
-                    logging.error(f"Model loading error: {e}")
-                    logging.error(traceback.format_exc())
-                    self.model_loaded = False
-                    self.model = None
-                    self.window.after(0, lambda: self.update_status("❌ AI Model Error", "#FF4757"))
-                finally:
-                    self.model_loading = False
-
-        threading.Thread(target=load_in_background, daemon=True).start()
+            self.model_loaded = True
+            self.notify_status("✅ AI Model Ready!", "#00D084")
+            return model
+        
+        except Exception as e:
+            print(f"❌ Model loading error: {e}")
+            print("Full traceback:")
+            traceback.print_exc()
+            logging.error(f"Model loading error: {e}")
+            logging.error(traceback.format_exc())
+            self.model_loaded = False
+            self.notify_status("❌ AI Model Error", "#FF4757")
+            return None
+        finally:
+            self.model_loading = False
+
+    def get_stock_data(self, symbol):
+        cached = data_cache.get(symbol, "quote")
+        if cached is not None:
+            return cached
+        try:
+            hist = price_store.history(symbol, limit=2)
+            if hist is None:
+                return {"error": "Data not available"}
+            quote = quote_from_history(hist)
+            data_cache.set(symbol, "quote", quote)
+            return quote
+        except Exception as e:
+            logging.error(f"Error fetching stock data for {symbol}: {e}")
+            return {"error": str(e)}
+
+    def get_company_info(self, symbol):
+        try:
+            info = get_ticker_info(symbol)
+            return {
+                "name": info.get("shortName", info.get("longName", symbol)),
+                "industry": info.get("industry", "Unknown"),
+                "sector": info.get("sector", "Unknown"),
+                "country": info.get("country", "Unknown"),
+                "marketCap": info.get("marketCap", 0),
+            }
+        except Exception as e:
+            logging.error(f"Error fetching company info for {symbol}: {e}")
+            return {
+                "name": symbol,
+                "industry": "Unknown",
+                "sector": "Unknown",
+                "country": "Unknown",
+                "marketCap": 0,
+            }
+
+    def get_indicators(self, symbol):
+        """Latest technical indicators for symbol (see IndicatorState.snapshot), or None without history"""
+        return self.prefetch_indicators([symbol]).get(symbol.upper())
+
+    def prefetch_indicators(self, symbols):
+        """Bring indicators for many symbols up to date, feeding each only its new bars"""
+        try:
+            return indicator_tracker.refresh(symbols)
+        except Exception as e:
+            logging.error(f"Error computing indicators: {e}")
+            return {}
+
+    def create_basic_analysis(self, symbol, stock_data, company_info):
+        """AI olmadan temel analiz"""
+        current_price = stock_data["c"]
+        previous_close = stock_data["pc"]
+        daily_change = current_price - previous_close
+        daily_change_percent = (daily_change / previous_close) * 100
+        
+        analysis = "📈 BASIC TECHNICAL ANALYSIS:\n"
+        analysis += "-" * 30 + "\n\n"
+        
+        if daily_change_percent > 5:
+            analysis += "🟢 Strong upward momentum (+5% or more)\n"
+        elif daily_change_percent > 2:
+            analysis += "🟡 Moderate upward trend (+2% to +5%)\n"
+        elif daily_change_percent > 0:
+            analysis += "🟢 Slight positive movement\n"
+        elif daily_change_percent > -2:
+            analysis += "🟡 Minor decline (less than -2%)\n"
+        elif daily_change_percent > -5:
+            analysis += "🟠 Moderate decline (-2% to -5%)\n"
+        else:
+            analysis += "🔴 Significant decline (more than -5%)\n"
+        
+        day_range = stock_data['h'] - stock_data['l']
+        range_percent = (day_range / current_price) * 100
+        
+        analysis += f"\n📊 Volatility: {range_percent:.1f}% intraday range\n"
+        if range_percent > 5:
+            analysis += "High volatility - Risky for short term\n"
+        elif range_percent > 2:
+            analysis += "Moderate volatility - Normal trading\n"
+        else:
+            analysis += "Low volatility - Stable trading\n"
+
+        indicators = self.get_indicators(symbol)
+        rsi_value = indicators["rsi"] if indicators else None
+        if indicators:
+            analysis += "\n📐 TECHNICAL INDICATORS:\n"
+            analysis += "\n".join(describe_indicators(indicators)) + "\n"
+        
+        analysis += "\n💡 BASIC RECOMMENDATION:\n"
+        if daily_change_percent > 3 or (rsi_value is not None and rsi_value >= 70):
+            analysis += "⚠️ SELL - Consider taking profits if you own shares\n"
+        elif daily_change_percent < -3 or (rsi_value is not None and rsi_value <= 30):
+            analysis += "🔍 BUY - May be a buying opportunity if fundamentals are strong\n"
+        else:
+            analysis += "📊 HOLD - Normal trading, monitor for trends\n"
+        
+        analysis += "\n⚠️ Note: This is basic technical analysis only.\n"
+        analysis += "For detailed AI-powered fundamental analysis, please load an AI model."
+        
+        return analysis
+
+    def create_ai_analysis(self, symbol, data, company_info, on_token=None, priority=PRIORITY_INTERACTIVE):
+        current_price = data["c"]
+        previous_close = data["pc"]
+        daily_change = current_price - previous_close
+        daily_change_percent = (daily_change / previous_close) * 100
+        
+        indicators = self.get_indicators(symbol)
+        indicator_lines = format_indicator_prompt(indicators) + "\n" if indicators else ""
+
+        # Shorter, more focused prompt to prevent crashes
+        prompt = ANALYST_PROMPT_PREFIX + f"""Stock: {symbol}
+Price: ${current_price:.2f}
+Change: {daily_change_percent:+.1f}%
+High: ${data['h']:.2f}
+Low: ${data['l']:.2f}
+{indicator_lines}
+Give a short analysis and recommendation (BUY/HOLD/SELL):"""
+
+        try:
+            if not self.model_loaded:
+                return self.create_basic_analysis(symbol, data, company_info)
+            
+            cache_key = analysis_cache_key(prompt, self.model_path, AI_GENERATION_PARAMS)
+            cached = analysis_cache.get(cache_key, max_age=AI_CACHE_MAX_AGE)
+            if cached is not None:
+                logging.info(f"AI analysis for {symbol} served from cache")
+                return cached[0]
+
+            print(f"🤖 Starting AI analysis: {symbol}")
+            logging.info(f"Starting AI analysis for {symbol}")
+            
+            future = self.inference.submit(symbol, prompt, priority=priority, on_token=on_token, **AI_GENERATION_PARAMS)
+            self.notify_activity()
+            try:
+                response = future.result()
+            finally:
+                self.notify_activity()
+            
+            analysis = response.strip()
+            if not analysis or len(analysis) < 10:
+                logging.warning("AI response too short, falling back to basic analysis")
+                return f"❌ AI response incomplete!\n\n{self.create_basic_analysis(symbol, data, company_info)}"
+            
+            print(f"✅ AI analysis completed: {len(analysis)} characters")
+            logging.info(f"AI analysis completed successfully: {len(analysis)} characters")
+            analysis_cache.set(cache_key, analysis)
+            return analysis
+            
+        except CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Error generating AI analysis: {e}")
+            traceback.print_exc()
+            logging.error(f"Error generating AI analysis: {e}")
+            logging.error(traceback.format_exc())
+            return f"❌ AI Analysis Error: {str(e)}\n\n{self.create_basic_analysis(symbol, data, company_info)}"
+
+    def screen_symbols(self, symbols, on_progress=None):
+        """AI-screen a list of symbols and return rows ranked BUY > HOLD > SELL.
+
+        Quotes for every symbol come from one bulk download; prompts are then
+        queued for the model back to back while company info downloads in
+        parallel, so the model never waits on the network.
+        """
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        price_store.sync(symbols)
+        self.prefetch_indicators(symbols)
+        info_pool = ThreadPoolExecutor(max_workers=1)
+        infos = info_pool.submit(fetch_bulk_info, symbols)
+
+        completed = [0]
+        completed_lock = threading.Lock()
+
+        def screen_one(symbol):
+            try:
+                stock_data = self.get_stock_data(symbol)
+                if "error" in stock_data:
+                    return stock_data, ""
+                basic_info = {"name": symbol}
+                if self.model_loaded:
+                    analysis = self.create_ai_analysis(symbol, stock_data, basic_info, priority=PRIORITY_BATCH)
+                else:
+                    analysis = self.create_basic_analysis(symbol, stock_data, basic_info)
+                return stock_data, analysis
+            finally:
+                with completed_lock:
+                    completed[0] += 1
+                    done = completed[0]
+                if on_progress:
+                    on_progress(done, len(symbols))
+
+        results = fetch_concurrently(screen_one, symbols, max_workers=SCREEN_MAX_IN_FLIGHT, timeout=SCREEN_ITEM_TIMEOUT)
+        infos = infos.result()
+        info_pool.shutdown()
+
+        rows = []
+        for symbol, result in zip(symbols, results):
+            info = infos.get(symbol) or {}
+            row = {
+                "symbol": symbol,
+                "name": info.get("shortName", info.get("longName", symbol)),
+                "sector": info.get("sector", "Unknown"),
+                "price": None,
+                "change": None,
+                "recommendation": "N/A",
+                "analysis": "",
+            }
+            if isinstance(result, Exception):
+                row["analysis"] = f"Screen failed: {result}"
+            else:
+                stock_data, analysis = result
+                if "error" in stock_data:
+                    row["analysis"] = f"No data: {stock_data['error']}"
+                else:
+                    row["price"] = float(stock_data["c"])
+                    row["change"] = float((stock_data["c"] - stock_data["pc"]) / stock_data["pc"] * 100)
+                    row["analysis"] = analysis
+                    row["recommendation"] = parse_recommendation(analysis)
+            rows.append(row)
+        return rank_screen_results(rows)
+
+    def analyze(self, symbol, use_ai=True):
+        """Full single-stock analysis as a plain dict (what the GUI shows, without the GUI)"""
+        symbol = symbol.strip().upper()
+        stock_data = self.get_stock_data(symbol)
+        if "error" in stock_data:
+            return {"symbol": symbol, "error": stock_data["error"]}
+
+        company_info = self.get_company_info(symbol)
+        if use_ai and self.model_loaded:
+            analysis = self.create_ai_analysis(symbol, stock_data, company_info)
+            source = "ai"
+        else:
+            analysis = self.create_basic_analysis(symbol, stock_data, company_info)
+            source = "basic"
+        return {
+            "symbol": symbol,
+            "company": company_info,
+            "quote": {
+                "price": float(stock_data["c"]),
+                "previous_close": float(stock_data["pc"]),
+                "change_pct": float((stock_data["c"] - stock_data["pc"]) / stock_data["pc"] * 100),
+                "high": float(stock_data["h"]),
+                "low": float(stock_data["l"]),
+            },
+            "analysis": analysis,
+            "analysis_source": source,
+            "recommendation": parse_recommendation(analysis),
+        }
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller runs the function; callers arriving while it is in flight
+    wait for and share its result (or exception). Nothing is kept afterwards.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Returns (result, shared) where shared is True for callers that piggybacked"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class RequestStats:
+    """Per-endpoint request counts, latency percentiles and recent throughput"""
+
+    def __init__(self, samples=SERVICE_LATENCY_SAMPLES, window=SERVICE_THROUGHPUT_WINDOW):
+        self.samples = samples
+        self.window = window
+        self.started = time.monotonic()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok=True, coalesced=False):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    "requests": 0,
+                    "errors": 0,
+                    "coalesced": 0,
+                    "latencies": deque(maxlen=self.samples),
+                    "finished": deque(),
+                }
+            entry["requests"] += 1
+            if not ok:
+                entry["errors"] += 1
+            if coalesced:
+                entry["coalesced"] += 1
+            entry["latencies"].append(seconds)
+            entry["finished"].append(now)
+            while entry["finished"][0] < now - self.window:
+                entry["finished"].popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        uptime = now - self.started
+        # Requests/sec over the last window, or since start if we are younger than that
+        window = max(min(self.window, uptime), 1e-9)
+        endpoints = {}
+        with self._lock:
+            for endpoint, entry in self._endpoints.items():
+                latencies = sorted(entry["latencies"])
+                recent = sum(1 for finished in entry["finished"] if finished >= now - self.window)
+                endpoints[endpoint] = {
+                    "requests": entry["requests"],
+                    "errors": entry["errors"],
+                    "coalesced": entry["coalesced"],
+                    "latency_ms": {
+                        "p50": percentile(latencies, 50) * 1000,
+                        "p95": percentile(latencies, 95) * 1000,
+                        "max": latencies[-1] * 1000 if latencies else 0.0,
+                    },
+                    "requests_per_sec": recent / window,
+                }
+        return {
+            "uptime_sec": uptime,
+            "requests": sum(entry["requests"] for entry in endpoints.values()),
+            "requests_per_sec": sum(entry["requests_per_sec"] for entry in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+class AnalysisService:
+    """Shares one AnalysisEngine (model, caches, price store) between HTTP clients.
+
+    Work is keyed by endpoint and symbol in a SingleFlight, so a burst of
+    dashboards asking for the same stock triggers one quote download and one
+    generation; the engine's own caches answer the requests that come after.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.flights = SingleFlight()
+        self.stats = RequestStats()
+
+    def quote(self, symbol):
+        stock_data = self.engine.get_stock_data(symbol)
+        if "error" in stock_data:
+            raise LookupError(stock_data["error"])
+        return {
+            "symbol": symbol,
+            "price": float(stock_data["c"]),
+            "previous_close": float(stock_data["pc"]),
+            "change_pct": float((stock_data["c"] - stock_data["pc"]) / stock_data["pc"] * 100),
+            "high": float(stock_data["h"]),
+            "low": float(stock_data["l"]),
+        }
+
+    def info(self, symbol):
+        return dict(self.engine.get_company_info(symbol), symbol=symbol)
+
+    def analyze(self, symbol, use_ai=True):
+        result = self.engine.analyze(symbol, use_ai=use_ai)
+        if "error" in result:
+            raise LookupError(result["error"])
+        return result
+
+    def portfolio(self, investor):
+        code = resolve_name_to_dataroma_code(investor)
+        if code is None:
+            # Only mapped investors reach Dataroma; anything else would cost a scrape
+            codes = {known.lower(): known for known in DATAROMA_INVESTORS.values()}
+            code = codes.get(investor.strip().lower())
+        if code is None:
+            raise LookupError(f"Unknown investor: {investor}")
+        tickers = get_dataroma_portfolio(code)
+        if not tickers:
+            raise LookupError(f"No holdings found for {investor}")
+        price_store.sync(tickers)
+        quotes = fetch_concurrently(self.engine.get_stock_data, tickers)
+        holdings = []
+        for ticker, stock_data in zip(tickers, quotes):
+            row = {"symbol": ticker, "price": None, "change_pct": None}
+            if not isinstance(stock_data, Exception) and "error" not in stock_data:
+                row["price"] = float(stock_data["c"])
+                row["change_pct"] = float((stock_data["c"] - stock_data["pc"]) / stock_data["pc"] * 100)
+            holdings.append(row)
+        return {"investor": investor, "code": code, "holdings": holdings}
+
+    def status(self):
+        inference = self.engine.inference
+        if self.engine.model_loaded:
+            model = "ready"
+        elif self.engine.model_loading:
+            model = "loading"
+        else:
+            model = "unavailable"
+        return {
+            "model": model,
+            "model_path": self.engine.model_path,
+            "ai_busy": bool(inference and inference.busy),
+            "ai_queue": inference.queue_depth() if inference else 0,
+            "quote_cache": data_cache.stats(),
+        }
+
+    def handle(self, endpoint, argument, params):
+        """Dispatch one request; returns (http_status, json_body)"""
+        if endpoint == "health":
+            return 200, self.status()
+        if endpoint == "stats":
+            return 200, dict(self.stats.snapshot(), **self.status())
+        if endpoint not in ("quote", "info", "analyze", "portfolio"):
+            return 404, {"error": f"Unknown endpoint: /{endpoint}"}
+        if not argument.strip():
+            noun = "investor" if endpoint == "portfolio" else "symbol"
+            return 400, {"error": f"Usage: /{endpoint}/<{noun}>"}
+
+        if endpoint == "portfolio":
+            key = (endpoint, argument.strip().lower())
+            func = lambda: self.portfolio(argument)
+        elif endpoint == "analyze":
+            symbol = argument.strip().upper()
+            use_ai = params.get("ai", ["1"])[0].lower() not in ("0", "false", "no")
+            key = (endpoint, symbol, use_ai)
+            func = lambda: self.analyze(symbol, use_ai=use_ai)
+        else:
+            symbol = argument.strip().upper()
+            key = (endpoint, symbol)
+            func = lambda: getattr(self, endpoint)(symbol)
+
+        started = time.monotonic()
+        coalesced = False
+        try:
+            body, coalesced = self.flights.do(key, func)
+            status = 200
+        except LookupError as e:
+            status, body = 404, {"error": str(e)}
+        except CancelledError:
+            status, body = 503, {"error": "Analysis was cancelled, please retry"}
+        except Exception as e:
+            logging.error(f"Service error on /{endpoint}/{argument}: {e}")
+            logging.error(traceback.format_exc())
+            status, body = 500, {"error": str(e)}
+        self.stats.record(endpoint, time.monotonic() - started, ok=status == 200, coalesced=coalesced)
+        return status, body
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """GET /quote/<symbol>, /info/<symbol>, /analyze/<symbol>[?ai=0], /portfolio/<investor>, /stats, /health"""
+
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint, _, argument = url.path.strip("/").partition("/")
+        status, body = self.service.handle(endpoint, unquote(argument), parse_qs(url.query))
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.info(f"HTTP {self.address_string()} {format % args}")
+
+def run_service(engine, host=SERVICE_HOST, port=SERVICE_PORT):
+    """Serve the engine over HTTP until interrupted"""
+    service = AnalysisService(engine)
+    handler = type("BoundAnalysisRequestHandler", (AnalysisRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    address = f"http://{host}:{server.server_address[1]}"
+    print(f"🌐 Serving on {address} (Ctrl+C to stop)")
+    logging.info(f"HTTP service listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Stopping service...")
+    finally:
+        server.server_close()
+
+def diff_tree_rows(current, order, rows):
+    """Operations that turn a keyed table into `rows`, a list of (key, values) in display order.
+
+    current maps key -> values already shown and order is their display order.
+    Returns ("delete", key), ("insert", key, index, values),
+    ("move", key, index) and ("set", key, column, value) tuples, applied in
+    sequence; unchanged cells produce nothing.
+    """
+    target = OrderedDict()
+    for key, values in rows:
+        target.setdefault(key, tuple(values))
+
+    operations = [("delete", key) for key in order if key not in target]
+    remaining = [key for key in order if key in target]
+    for index, (key, values) in enumerate(target.items()):
+        if key not in current:
+            operations.append(("insert", key, index, values))
+            remaining.insert(index, key)
+            continue
+        if index >= len(remaining) or remaining[index] != key:
+            operations.append(("move", key, index))
+            remaining.remove(key)
+            remaining.insert(index, key)
+        old_values = current[key]
+        for column, value in enumerate(values):
+            if column >= len(old_values) or old_values[column] != value:
+                operations.append(("set", key, column, value))
+    return operations
+
+class TreeviewSync:
+    """Keyed row model for a ttk.Treeview: refreshes become diffs applied in small batches.
+
+    Rows use their key (the ticker) as the Treeview iid, so selection and
+    scroll position survive a refresh. Operations run TREE_UPDATE_CHUNK at a
+    time through schedule (window.after), letting Tk handle events between
+    batches. A newer apply() supersedes batches still waiting to run.
+    """
+
+    def __init__(self, tree, schedule, chunk_size=TREE_UPDATE_CHUNK):
+        self.tree = tree
+        self.schedule = schedule
+        self.chunk_size = chunk_size
+        self.columns = tree["columns"]
+        self.rows = []
+        self.current = {}
+        self.order = []
+        self._generation = 0
+
+    def apply(self, rows, on_done=None):
+        """Must be called on the Tk thread; self.rows holds the latest requested rows right away"""
+        self.rows = [(key, tuple(values)) for key, values in rows]
+        self._generation += 1
+        operations = diff_tree_rows(self.current, self.order, rows)
+        self._run(self._generation, operations, 0, on_done)
+
+    def _run(self, generation, operations, start, on_done):
+        if generation != self._generation:
+            return
+        for operation in operations[start:start + self.chunk_size]:
+            self._perform(operation)
+        start += self.chunk_size
+        if start < len(operations):
+            self.schedule(0, lambda: self._run(generation, operations, start, on_done))
+        elif on_done:
+            on_done()
+
+    def _perform(self, operation):
+        kind, key = operation[0], operation[1]
+        if kind == "delete":
+            self.tree.delete(key)
+            del self.current[key]
+            self.order.remove(key)
+        elif kind == "insert":
+            _, _, index, values = operation
+            self.tree.insert("", index, iid=key, values=values)
+            self.current[key] = values
+            self.order.insert(index, key)
+        elif kind == "move":
+            index = operation[2]
+            self.tree.move(key, "", index)
+            self.order.remove(key)
+            self.order.insert(index, key)
+        else:
+            _, _, column, value = operation
+            self.tree.set(key, self.columns[column], value)
+            values = list(self.current[key])
+            values[column:column + 1] = [value]
+            self.current[key] = tuple(values)
+
+def chart_range_start(chart_range):
+    """First date of a daily CHART_RANGES entry, or None for MAX"""
+    days = CHART_RANGES[chart_range]["days"]
+    return date.today() - timedelta(days=days) if days else None
+
+def chart_history(symbol, chart_range=CHART_DEFAULT_RANGE):
+    """Bars for a CHART_RANGES entry as a DataFrame, oldest first; None when Yahoo has nothing.
+
+    Intraday ranges are downloaded and kept in data_cache for
+    CACHE_TTLS["intraday_*"], with timestamps in exchange time. Daily
+    ranges come from the price store, backfilled the first time a range
+    reaches further back than the stored bars.
+    """
+    symbol = symbol.upper()
+    spec = CHART_RANGES[chart_range]
+    if "interval" not in spec:
+        start = chart_range_start(chart_range)
+        price_store.backfill([symbol], start)
+        return price_store.history(symbol, start=start, sync=False)
+
+    kind = f"intraday_{spec['period']}"
+    hist = data_cache.get(symbol, kind)
+    if hist is None:
+        hist = fetch_bulk_history([symbol], period=spec["period"], interval=spec["interval"], auto_adjust=False).get(symbol)
+        if hist is None:
+            return None
+        if hist.index.tz is not None:
+            hist = hist.tz_convert(market_timezone()).tz_localize(None)
+        data_cache.set(symbol, kind, hist)
+    return hist
+
+def downsample_minmax(x, values, volume, buckets):
+    """Thin a series to at most two points per bucket, keeping each bucket's lowest and highest value.
+
+    Samples are split into equal consecutive buckets; their min and max are
+    kept in time order, plus the last sample, so spikes and drawdowns
+    survive at any range. Returns (x, values, bucket x, volume summed per
+    bucket). Series that already fit are returned unchanged.
+    """
+    n = len(values)
+    if n <= 2 * buckets:
+        return x, values, x, volume
+    size = math.ceil(n / buckets)
+    count = math.ceil(n / size)
+    starts = np.arange(count) * size
+    grid = np.full(count * size, np.nan)
+    grid[:n] = values
+    grid = grid.reshape(count, size)
+    lows = starts + np.nanargmin(grid, axis=1)
+    highs = starts + np.nanargmax(grid, axis=1)
+    keep = np.unique(np.concatenate([lows, highs, [n - 1]]))
+    return x[keep], values[keep], x[starts], np.add.reduceat(np.nan_to_num(volume), starts)
+
+class ChartPanel:
+    """Price and volume chart embedded in the window, built once and reused for every ticker.
+
+    Figure, axes and artists are created on first use. Showing another ticker
+    swaps new data into the same artists (set_data/set_verts/set_segments)
+    instead of building a figure. The price line, fill, volume bars and price
+    tag are animated artists: a full draw caches the static background (axes,
+    ticks, title) in _on_draw, and updates that fit inside the current limits,
+    such as a polled price, are blitted over it. Long ranges are thinned with
+    downsample_minmax, so the points drawn never exceed the plot width.
+    """
+
+    def __init__(self, parent, colors):
+        from matplotlib.figure import Figure
+        from matplotlib.collections import LineCollection
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        import matplotlib.dates as mdates
+
+        self.colors = colors
+        self.symbol = None
+        self.chart_range = None
+        self.x = None
+        self.close = None
+        self.volume_values = None
+        self.drawn = None
+        self.drawn_volume = None
+        self._limits = None
+        self._background = None
+
+        self.figure = Figure(figsize=(8, 3.2), dpi=100, facecolor=colors['bg_primary'])
+        self.ax = self.figure.add_subplot(111, facecolor=colors['bg_primary'])
+        self.volume_ax = self.ax.twinx()
+        for axis in (self.ax, self.volume_ax):
+            axis.tick_params(colors=colors['text_secondary'], labelsize=8)
+            for spine in axis.spines.values():
+                spine.set_color(colors['bg_secondary'])
+        self.ax.grid(True, alpha=0.3, linestyle='--')
+        self.ax.set_ylabel('Price ($)', color='white', fontsize=9)
+        self.volume_ax.set_ylabel('Volume', color='#3742FA', fontsize=9)
+        # The concise formatter switches between times, days, months and years with the range
+        locator = mdates.AutoDateLocator(maxticks=8)
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.title = self.ax.set_title("", fontsize=12, fontweight='bold', color='white')
+        self._date2num = mdates.date2num
+
+        self.volume = LineCollection([], colors='#3742FA', alpha=0.3, animated=True)
+        self.volume_ax.add_collection(self.volume)
+        self.fill = self.ax.fill_between([], [], alpha=0.2, color='#00D084', animated=True)
+        (self.line,) = self.ax.plot([], [], linewidth=2.5, color='#00D084', alpha=0.8, animated=True)
+        self.price_tag = self.ax.annotate(
+            "", xy=(0, 0), xytext=(-10, 10), textcoords='offset points', ha='right',
+            bbox=dict(boxstyle='round,pad=0.3', fc='#00D084', alpha=0.8),
+            fontsize=10, fontweight='bold', color='white', animated=True,
+        )
+        self._animated = (self.volume, self.fill, self.line, self.price_tag)
+        self.figure.subplots_adjust(left=0.08, right=0.92, top=0.88, bottom=0.12)
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=parent)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.configure(bg=colors['bg_primary'], highlightthickness=0)
+
+    def show(self, symbol, hist, chart_range=CHART_DEFAULT_RANGE):
+        """Display hist (a bar DataFrame from chart_history) for symbol, reusing every artist.
+
+        Showing the same symbol and dates again (a polled price) keeps the
+        axes and is blitted when the new values fit inside them.
+        """
+        symbol = symbol.upper()
+        self.chart_range = chart_range
+        x = self._date2num(hist.index.to_pydatetime())
+        if symbol != self.symbol or self.x is None or not np.array_equal(x, self.x):
+            self._limits = None
+        self.symbol = symbol
+        self.x = x
+        self.close = hist["Close"].to_numpy(dtype=float)
+        self.volume_values = hist["Volume"].fillna(0).to_numpy(dtype=float)
+        self.title.set_text(f"{symbol} Stock Price & Volume - {chart_range}")
+        self._update_artists()
+        self._redraw()
+
+    def _update_artists(self):
+        width_px = self.ax.get_window_extent().width or 600
+        buckets = max(int(width_px // CHART_BUCKET_PIXELS), 1)
+        x, close, volume_x, volume = downsample_minmax(self.x, self.close, self.volume_values, buckets)
+        self.drawn = (x, close)
+        self.drawn_volume = volume
+        self.line.set_data(x, close)
+        self.price_tag.xy = (x[-1], close[-1])
+        self.price_tag.set_text(f"${close[-1]:.2f}")
+
+        bar_points = max(width_px / max(len(volume_x), 1) * 0.6 * 72 / self.figure.dpi, 0.5)
+        self.volume.set_segments([[(xi, 0), (xi, vi)] for xi, vi in zip(volume_x, volume)])
+        self.volume.set_linewidth(bar_points)
+
+    def _target_limits(self):
+        x, close = self.x, self.close
+        pad_x = (x[-1] - x[0]) * 0.03 or 1
+        low, high = float(np.nanmin(close)), float(np.nanmax(close))
+        pad_y = (high - low) * 0.08 or high * 0.02 or 1
+        volume_top = float(self.drawn_volume.max()) * 1.1 or 1
+        return (x[0] - pad_x, x[-1] + pad_x), (low - pad_y, high + pad_y), volume_top
+
+    def _redraw(self):
+        limits = self._target_limits()
+        current = self._limits
+        fits = (
+            current is not None
+            and current[1][0] <= float(np.nanmin(self.close))
+            and float(np.nanmax(self.close)) <= current[1][1]
+            and float(self.drawn_volume.max()) <= current[2]
+        )
+        if not fits:
+            (x_min, x_max), (y_min, y_max), volume_top = self._limits = limits
+            self.ax.set_xlim(x_min, x_max)
+            self.ax.set_ylim(y_min, y_max)
+            self.volume_ax.set_ylim(0, volume_top)
+        # The fill reaches down to the bottom of the price axis
+        bottom = self._limits[1][0]
+        x, close = self.drawn
+        self.fill.set_verts([[(x[0], bottom)] + list(zip(x, close)) + [(x[-1], bottom)]])
+        if fits and self._background is not None:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.figure.bbox)
+        else:
+            self.canvas.draw()
+
+    def _on_draw(self, event):
+        """After a full draw: keep the static background and paint the animated artists on top"""
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        if self.x is None:
+            return
+        for artist in self._animated:
+            self.figure.draw_artist(artist)
+
+def comparison_history(symbols, chart_range=CHART_DEFAULT_RANGE):
+    """Closing prices for a CHART_RANGES entry as one date x symbol DataFrame; None when nothing was found.
+
+    Daily ranges take one store sync and one backfill for the whole list,
+    intraday ranges one batched download. Symbols without data are left out.
+    """
+    symbols = [s.upper() for s in dict.fromkeys(symbols)]
+    spec = CHART_RANGES[chart_range]
+    closes = {}
+    if "interval" in spec:
+        histories = fetch_bulk_history(symbols, period=spec["period"], interval=spec["interval"], auto_adjust=False)
+        for symbol, hist in histories.items():
+            closes[symbol] = hist["Close"]
+    else:
+        start = chart_range_start(chart_range)
+        price_store.backfill(symbols, start)
+        for symbol in symbols:
+            rows = price_store.bars(symbol, start=start)
+            if rows:
+                closes[symbol] = pd.Series([row[4] for row in rows], index=pd.to_datetime([row[0] for row in rows]))
+    if not closes:
+        return None
+    frame = pd.DataFrame(closes)[[s for s in symbols if s in closes]].sort_index()
+    if frame.index.tz is not None:
+        frame = frame.tz_convert(market_timezone()).tz_localize(None)
+    return frame
+
+def normalized_returns(closes):
+    """Cumulative price return in percent of each column since its first close in the frame.
+
+    Gaps (a holiday on one exchange, a late listing) carry the last close
+    forward; rows before a column's first close stay NaN.
+    """
+    values = closes.ffill().to_numpy(dtype=float)
+    first = np.argmax(~np.isnan(values), axis=0)
+    base = values[first, np.arange(values.shape[1])]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (values / base - 1) * 100
+
+class ComparisonPanel:
+    """Normalized return lines for several tickers on one embedded figure.
+
+    Like ChartPanel the figure is built once; line artists are pooled, so a
+    new comparison only swaps data into them and hides the spare ones.
+    """
+
+    def __init__(self, parent, colors):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.ticker import PercentFormatter
+        import matplotlib.dates as mdates
+        import matplotlib
+
+        self.colors = colors
+        self.symbols = []
+        self._palette = matplotlib.colormaps["tab20"].colors
+        self._date2num = mdates.date2num
+
+        self.figure = Figure(figsize=(8, 3.2), dpi=100, facecolor=colors['bg_primary'])
+        self.ax = self.figure.add_subplot(111, facecolor=colors['bg_primary'])
+        self.ax.tick_params(colors=colors['text_secondary'], labelsize=8)
+        for spine in self.ax.spines.values():
+            spine.set_color(colors['bg_secondary'])
+        self.ax.grid(True, alpha=0.3, linestyle='--')
+        self.ax.set_ylabel('Return', color='white', fontsize=9)
+        self.ax.yaxis.set_major_formatter(PercentFormatter(decimals=0))
+        locator = mdates.AutoDateLocator(maxticks=8)
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.ax.axhline(0, color=colors['text_secondary'], linewidth=0.8, alpha=0.6)
+        self.title = self.ax.set_title("", fontsize=12, fontweight='bold', color='white')
+        self.lines = []
+        self.figure.subplots_adjust(left=0.08, right=0.8, top=0.88, bottom=0.12)
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=parent)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.configure(bg=colors['bg_primary'], highlightthickness=0)
+
+    def show(self, closes, chart_range=CHART_DEFAULT_RANGE, title=None):
+        """Plot every column of closes (from comparison_history) as cumulative return"""
+        returns = normalized_returns(closes)
+        x = self._date2num(closes.index.to_pydatetime())
+        self.symbols = list(closes.columns)
+        while len(self.lines) < len(self.symbols):
+            (line,) = self.ax.plot([], [], linewidth=1.5)
+            self.lines.append(line)
+
+        width_px = self.ax.get_window_extent().width or 600
+        buckets = max(int(width_px // CHART_BUCKET_PIXELS), 1)
+        for i, line in enumerate(self.lines):
+            if i >= len(self.symbols):
+                line.set_visible(False)
+                line.set_label(f"_{i}")
+                continue
+            valid = ~np.isnan(returns[:, i])
+            line_x, line_y, _, _ = downsample_minmax(x[valid], returns[valid, i], np.zeros(valid.sum()), buckets)
+            line.set_data(line_x, line_y)
+            line.set_color(self._palette[i % len(self._palette)])
+            line.set_label(f"{self.symbols[i]} {line_y[-1]:+.1f}%")
+            line.set_visible(True)
+
+        # Legend ordered best to worst
+        final = [returns[~np.isnan(returns[:, i]), i][-1] for i in range(len(self.symbols))]
+        order = sorted(range(len(self.symbols)), key=lambda i: -final[i])
+        legend = self.ax.legend(
+            [self.lines[i] for i in order], [self.lines[i].get_label() for i in order],
+            loc='upper left', bbox_to_anchor=(1.01, 1.0), fontsize=7, frameon=False,
+        )
+        for text in legend.get_texts():
+            text.set_color(self.colors['text_secondary'])
+
+        self.title.set_text(title or f"Cumulative Return - {chart_range}")
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+        self.canvas.draw()
+
+class StockAnalyzer:
+    def __init__(self, startup_report_only=False, config_path=MODEL_CONFIG_PATH, model_overrides=None):
+        print("🔧 Initializing Stock Analyzer...")
+        self.startup_report_only = startup_report_only
+        self.engine = AnalysisEngine(
+            config_path=config_path,
+            model_overrides=model_overrides,
+            on_status=lambda text, color: self.window.after(0, lambda: self.update_status(text, color)),
+            on_activity=lambda: self.window.after(0, self.update_ai_status),
+        )
+        self._stream_id = 0
+        self._stream_tokens = []
+        self._stream_flush_pending = False
+        self._stream_lock = threading.Lock()
+        self.quote_poller = QuotePoller(
+            get_symbols=lambda: [key for key, _ in self.buffett_rows.rows],
+            on_quotes=lambda quotes: self.window.after(0, lambda: self.apply_quotes(quotes)),
+            on_state=lambda session, delay, errors: self.window.after(0, lambda: self.update_poll_status(session, delay, errors)),
+        )
+        self.chart = None
+        self.chart_range = CHART_DEFAULT_RANGE
+        self.comparison = None
+        # Target of the comparison on screen; None while a single ticker is charted
+        self.compare_spec = None
+        
+        try:
+            print("🎨 Setting up user interface...")
+            self.setup_ui()
+            mark_startup("UI built")
+            print("✅ UI setup complete")
+            
+            # Holdings and the AI model (and their heavy imports) wait until the window is on screen
+            self.window.after_idle(self.on_first_paint)
+            print("✅ Initialization complete")
+            
+        except Exception as e:
+            print(f"❌ Error during initialization: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+    def on_first_paint(self):
+        mark_startup("first paint")
+        self.print_startup_report()
+
+        # Holdings and the model pull in the deferred imports; report again once both are in
+        self._startup_pending = {"holdings loaded", "model ready"}
+        self.load_buffett_data(on_done=lambda: self.startup_step_done("holdings loaded"))
+        if not self.startup_report_only:
+            self.quote_poller.start()
+        print("🤖 Starting model loading...")
+        self.engine.load_model()
+
+        def wait_for_model():
+            self.engine.wait_for_model()
+            self.window.after(0, lambda: self.startup_step_done("model ready"))
+
+        threading.Thread(target=wait_for_model, daemon=True).start()
+
+    def startup_step_done(self, milestone):
+        if milestone not in self._startup_pending:
+            return
+        self._startup_pending.discard(milestone)
+        mark_startup(milestone)
+        if self._startup_pending:
+            return
+        self.print_startup_report()
+        if self.startup_report_only:
+            self.window.quit()
+
+    def print_startup_report(self):
+        report = startup_report()
+        print(report)
+        logging.info(report)
 
     def setup_ui(self):
         try:
@@ -268,15 +3489,13 @@ class StockAnalyzer:
         """Handle window closing event properly"""
         try:
             print("🛑 Closing application...")
-            # Clean up model if loaded
-            if hasattr(self, 'model') and self.model:
-                try:
-                    # Try to properly close the model
-                    del self.model
-                    self.model = None
-                    print("✅ Model cleaned up")
-                except:
-                    pass
+            # Let the inference worker drop the model
+            try:
+                self.quote_poller.stop()
+                self.engine.shutdown()
+                print("✅ Model cleaned up")
+            except:
+                pass
             
             if hasattr(self, 'window'):
                 self.window.quit()
@@ -404,7 +3623,7 @@ class StockAnalyzer:
         
         examples_label = tk.Label(
             input_area,
-            text="💡 Examples: AAPL, TSLA, MSFT, Warren Buffett, Bill Gates, Ray Dalio",
+            text="💡 Examples: AAPL, TSLA, MSFT, Warren Buffett, Bill Gates, Who holds KO",
             font=("Segoe UI", 9),
             bg=self.colors['bg_card'],
             fg=self.colors['text_secondary']
@@ -425,6 +3644,40 @@ class StockAnalyzer:
             fg=self.colors['text_primary']
         ).pack(side=tk.LEFT)
         
+        # Packed above the results the first time a chart is shown
+        self.chart_frame = tk.Frame(results_card, bg=self.colors['bg_card'])
+        range_bar = tk.Frame(self.chart_frame, bg=self.colors['bg_card'])
+        range_bar.pack(fill=tk.X, pady=(0, 5))
+        self.chart_range_buttons = {}
+        for chart_range in CHART_RANGES:
+            button = tk.Button(
+                range_bar,
+                text=chart_range,
+                command=lambda chart_range=chart_range: self.select_chart_range(chart_range),
+                font=("Segoe UI", 8, "bold"),
+                bg=self.colors['bg_primary'],
+                fg=self.colors['text_secondary'],
+                relief="flat",
+                bd=0,
+                padx=8,
+                pady=2,
+                cursor="hand2"
+            )
+            button.pack(side=tk.LEFT, padx=(0, 4))
+            self.chart_range_buttons[chart_range] = button
+        self.highlight_chart_range()
+        tk.Button(
+            range_bar,
+            text="✖",
+            command=self.hide_chart,
+            font=("Segoe UI", 9),
+            bg=self.colors['bg_primary'],
+            fg=self.colors['text_secondary'],
+            relief="flat",
+            bd=0,
+            cursor="hand2"
+        ).pack(side=tk.RIGHT)
+        
         results_frame = tk.Frame(results_card, bg=self.colors['bg_card'])
         results_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
         
@@ -454,6 +3707,8 @@ class StockAnalyzer:
 🚀 HOW TO USE:
 1. Enter stock symbol (AAPL, GOOGL, TSLA, etc.)
 2. Or enter famous investor name (Warren Buffett, Bill Gates, etc.)  
+   Or ask "Who holds KO" to see which superinvestors own a stock
+   Or "screen AAPL MSFT KO", "screen Warren Buffett" or "screen watchlist" for a ranked AI screen
 3. Click 'AI ANALYZE' for AI-powered investment advice
 4. Use 'CHART' to visualize price trends
 5. Check sample portfolio on the right panel →
@@ -498,6 +3753,15 @@ class StockAnalyzer:
             cursor="hand2"
         )
         self.btn_refresh.pack(side=tk.RIGHT)
+
+        self.poll_label = tk.Label(
+            holdings_header,
+            text="",
+            font=("Segoe UI", 9),
+            bg=self.colors['bg_card'],
+            fg=self.colors['text_secondary']
+        )
+        self.poll_label.pack(side=tk.RIGHT, padx=(0, 10))
         
         table_frame = tk.Frame(holdings_card, bg=self.colors['bg_card'])
         table_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
@@ -532,6 +3796,7 @@ class StockAnalyzer:
         self.buffett_tree.configure(yscrollcommand=scrollbar.set)
         
         self.buffett_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.buffett_rows = TreeviewSync(self.buffett_tree, self.window.after)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         self.btn_analyze_buffett = tk.Button(
@@ -548,42 +3813,79 @@ class StockAnalyzer:
             cursor="hand2"
         )
         self.btn_analyze_buffett.pack(pady=(0, 20))
-        
-        self.load_buffett_data()
 
     def update_status(self, text, color):
         self.status_label.config(text=text, fg=color)
 
-    def load_buffett_data(self):
+    def update_ai_status(self):
+        inference = self.engine.inference
+        if inference is None or not self.engine.model_loaded:
+            return
+        depth = inference.queue_depth()
+        if inference.busy or depth:
+            self.update_status(f"🤖 AI Working... ({depth} queued)", self.colors['warning'])
+        else:
+            self.update_status("✅ AI Model Ready!", self.colors['accent'])
+
+    def load_buffett_data(self, on_done=None):
+        """Fetch holdings in the background and diff them into the table; on_done runs on the Tk thread"""
         def load_data():
             try:
                 self.window.after(0, lambda: self.update_status("🔄 Loading Holdings...", self.colors['warning']))
-                holdings = get_buffett_top_holdings_data()
-
-                def clear_and_populate():
-                    for item in self.buffett_tree.get_children():
-                        self.buffett_tree.delete(item)
-                    for row in holdings:
-                        self.buffett_tree.insert("", tk.END, values=row)
-
-                self.window.after(0, clear_and_populate)
+                watchlist = read_symbol_file(WATCHLIST_PATH) if os.path.exists(WATCHLIST_PATH) else []
+                holdings = get_buffett_top_holdings_data(watchlist)
+                rows = [(row[0], row) for row in holdings]
+                self.window.after(0, lambda: self.buffett_rows.apply(rows, on_done=on_done))
             except Exception as e:
+                logging.error(f"Error loading holdings: {e}")
                 self.window.after(0, lambda: self.update_status("❌ Loading Failed", self.colors['danger']))
+                if on_done:
+                    self.window.after(0, on_done)
 
         threading.Thread(target=load_data, daemon=True).start()
 
     def refresh_buffett_data(self):
+        """Reload holdings and fundamentals, then have the poller fetch fresh quotes right away"""
         self.btn_refresh.config(state="disabled", text="⏳")
-        
-        def refresh():
-            try:
-                self.load_buffett_data()
-                time.sleep(2)
-                self.window.after(0, lambda: self.btn_refresh.config(state="normal", text="🔄"))
-            except:
-                self.window.after(0, lambda: self.btn_refresh.config(state="normal", text="🔄"))
+        logging.info(f"Refreshing holdings, cache stats before reset: {data_cache.stats()}")
+        data_cache.invalidate()
+
+        def on_done():
+            self.btn_refresh.config(state="normal", text="🔄")
+            self.quote_poller.poll_now()
+
+        self.load_buffett_data(on_done=on_done)
+
+    def apply_quotes(self, quotes):
+        """Put polled prices into the holdings table; only the cells that changed are touched"""
+        rows = []
+        for key, values in self.buffett_rows.rows:
+            quote = quotes.get(key)
+            if quote:
+                values = values[:2] + (format_holdings_price(quote["c"]),) + values[3:]
+            rows.append((key, values))
+        self.buffett_rows.apply(rows)
 
-        threading.Thread(target=refresh, daemon=True).start()
+        # A polled price for the charted ticker is blitted onto the existing daily chart
+        chart = self.chart
+        if (
+            chart is not None and self.compare_spec is None and chart.symbol in quotes
+            and self.chart_frame.winfo_ismapped() and "days" in CHART_RANGES[chart.chart_range]
+        ):
+            hist = price_store.history(chart.symbol, start=chart_range_start(chart.chart_range), sync=False)
+            if hist is not None:
+                chart.show(chart.symbol, hist, chart.chart_range)
+
+    def update_poll_status(self, session, delay, errors):
+        if errors:
+            text = f"⚠️ Quotes failing, retry in {delay:.0f}s"
+        elif session == "closed":
+            text = "⏸ Market closed"
+        elif session == "open":
+            text = f"🟢 Live · {delay:.0f}s"
+        else:
+            text = f"🌙 {session.replace('_', '-').title()} · {delay:.0f}s"
+        self.poll_label.config(text=text)
 
     def analyze_selected_buffett_stock(self):
         selection = self.buffett_tree.selection()
@@ -611,8 +3913,20 @@ class StockAnalyzer:
         def analyze_in_background():
             try:
                 investor_code = resolve_name_to_dataroma_code(symbol)
+                holders_query = re.match(r"^who\s+holds\s+([A-Za-z0-9.\-]+)\??$", symbol, re.IGNORECASE)
+                screen_query = re.match(r"^screen\s+(.+)$", symbol, re.IGNORECASE)
+                filter_query = re.match(r"^filter\s+(.+)$", symbol, re.IGNORECASE)
+                compare_query = re.match(r"^compare\s+(.+)$", symbol, re.IGNORECASE)
                 
-                if investor_code:
+                if holders_query:
+                    self.analyze_holders(holders_query.group(1).upper())
+                elif screen_query:
+                    self.analyze_screen(screen_query.group(1))
+                elif filter_query:
+                    self.analyze_filter(filter_query.group(1))
+                elif compare_query:
+                    self.analyze_compare(compare_query.group(1))
+                elif investor_code:
                     self.analyze_investor_portfolio(symbol, investor_code)
                 else:
                     self.analyze_single_stock(symbol.upper())
@@ -622,39 +3936,47 @@ class StockAnalyzer:
                 traceback.print_exc()
                 logging.error(f"Error in analyze_stock: {e}")
                 logging.error(traceback.format_exc())
-                self.window.after(0, lambda: self.display_error(f"Analysis failed: {str(e)}"))
+                message = f"Analysis failed: {str(e)}"
+                self.window.after(0, lambda: self.display_error(message))
             finally:
                 self.window.after(0, lambda: self.btn_analyze.config(state="normal", text="🤖 AI ANALYZE"))
         
         threading.Thread(target=analyze_in_background, daemon=True).start()
 
     def analyze_single_stock(self, symbol):
+        stream_id = self.begin_analysis_stream()
         try:
-            stock_data = self.get_stock_data(symbol)
+            stock_data = self.engine.get_stock_data(symbol)
             if "error" in stock_data:
                 self.window.after(0, lambda: self.display_error(f"Could not get data for {symbol}: {stock_data['error']}"))
                 return
                 
-            company_info = self.get_company_info(symbol)
+            company_info = self.engine.get_company_info(symbol)
             
             # Always try AI analysis first if model is available
-            if self.model_loaded and self.model:
+            if self.engine.model_loaded:
                 try:
-                    analysis = self.create_ai_analysis(symbol, stock_data, company_info)
+                    on_token = self.start_analysis_stream(stream_id, symbol, stock_data, company_info)
+                    analysis = self.engine.create_ai_analysis(symbol, stock_data, company_info, on_token=on_token)
+                except CancelledError:
+                    # A newer analysis of the same symbol replaced this one and will display itself
+                    logging.info(f"AI analysis for {symbol} superseded by a newer request")
+                    return
                 except Exception as ai_error:
                     print(f"❌ AI analysis failed, falling back to basic: {ai_error}")
-                    analysis = "❌ AI analysis failed. Showing basic analysis:\n\n" + self.create_basic_analysis(symbol, stock_data, company_info)
+                    analysis = "❌ AI analysis failed. Showing basic analysis:\n\n" + self.engine.create_basic_analysis(symbol, stock_data, company_info)
             else:
-                analysis = "⚠️ AI model not available. Showing basic analysis:\n\n" + self.create_basic_analysis(symbol, stock_data, company_info)
+                analysis = "⚠️ AI model not available. Showing basic analysis:\n\n" + self.engine.create_basic_analysis(symbol, stock_data, company_info)
       
-            self.window.after(0, lambda: self.display_stock_analysis(symbol, stock_data, company_info, analysis))
+            self.window.after(0, lambda: self.display_stock_analysis(symbol, stock_data, company_info, analysis, stream_id=stream_id))
             
         except Exception as e:
             print(f"❌ Error analyzing single stock {symbol}: {e}")
             traceback.print_exc()
             logging.error(f"Error analyzing single stock {symbol}: {e}")
             logging.error(traceback.format_exc())
-            self.window.after(0, lambda: self.display_error(f"{symbol} analysis failed: {str(e)}"))
+            message = f"{symbol} analysis failed: {str(e)}"
+            self.window.after(0, lambda: self.display_error(message))
 
     def analyze_investor_portfolio(self, investor_name, investor_code):
         try:
@@ -667,16 +3989,18 @@ class StockAnalyzer:
             portfolio_text += "=" * 60 + "\n\n"
             portfolio_text += f"Found {len(tickers)} holdings:\n\n"
             
-            for i, ticker in enumerate(tickers[:10], 1): 
-                try:
-                    stock_data = self.get_stock_data(ticker)
-                    if "error" not in stock_data:
-                        change = ((stock_data['c'] - stock_data['pc']) / stock_data['pc']) * 100
-                        portfolio_text += f"{i:2d}. {ticker:5s} - ${stock_data['c']:.2f} ({change:+.1f}%)\n"
-                    else:
-                        portfolio_text += f"{i:2d}. {ticker:5s} - Data not available\n"
-                except:
+            top_tickers = tickers[:10]
+            price_store.sync(top_tickers)
+            quotes = fetch_concurrently(self.engine.get_stock_data, top_tickers)
+
+            for i, (ticker, stock_data) in enumerate(zip(top_tickers, quotes), 1):
+                if isinstance(stock_data, Exception):
                     portfolio_text += f"{i:2d}. {ticker:5s} - Data fetch error\n"
+                elif "error" not in stock_data:
+                    change = ((stock_data['c'] - stock_data['pc']) / stock_data['pc']) * 100
+                    portfolio_text += f"{i:2d}. {ticker:5s} - ${stock_data['c']:.2f} ({change:+.1f}%)\n"
+                else:
+                    portfolio_text += f"{i:2d}. {ticker:5s} - Data not available\n"
             
             portfolio_text += f"\n💡 This portfolio belongs to the famous investor {investor_name}.\n"
             portfolio_text += "Click on one of the stocks above for detailed AI analysis."
@@ -688,85 +4012,187 @@ class StockAnalyzer:
             traceback.print_exc()
             logging.error(f"Error analyzing investor portfolio: {e}")
             logging.error(traceback.format_exc())
-            self.window.after(0, lambda: self.display_error(f"{investor_name} portfolio analysis failed: {str(e)}"))
+            message = f"{investor_name} portfolio analysis failed: {str(e)}"
+            self.window.after(0, lambda: self.display_error(message))
 
-    def create_basic_analysis(self, symbol, stock_data, company_info):
-        """AI olmadan temel analiz"""
-        current_price = stock_data["c"]
-        previous_close = stock_data["pc"]
-        daily_change = current_price - previous_close
-        daily_change_percent = (daily_change / previous_close) * 100
-        
-        analysis = "📈 BASIC TECHNICAL ANALYSIS:\n"
-        analysis += "-" * 30 + "\n\n"
-        
-        if daily_change_percent > 5:
-            analysis += "🟢 Strong upward momentum (+5% or more)\n"
-        elif daily_change_percent > 2:
-            analysis += "🟡 Moderate upward trend (+2% to +5%)\n"
-        elif daily_change_percent > 0:
-            analysis += "🟢 Slight positive movement\n"
-        elif daily_change_percent > -2:
-            analysis += "🟡 Minor decline (less than -2%)\n"
-        elif daily_change_percent > -5:
-            analysis += "🟠 Moderate decline (-2% to -5%)\n"
-        else:
-            analysis += "🔴 Significant decline (more than -5%)\n"
-        
-        day_range = stock_data['h'] - stock_data['l']
-        range_percent = (day_range / current_price) * 100
-        
-        analysis += f"\n📊 Volatility: {range_percent:.1f}% intraday range\n"
-        if range_percent > 5:
-            analysis += "High volatility - Risky for short term\n"
-        elif range_percent > 2:
-            analysis += "Moderate volatility - Normal trading\n"
-        else:
-            analysis += "Low volatility - Stable trading\n"
-        
-        analysis += "\n💡 BASIC RECOMMENDATION:\n"
-        if daily_change_percent > 3:
-            analysis += "⚠️ Consider taking profits if you own shares\n"
-        elif daily_change_percent < -3:
-            analysis += "🔍 May be a buying opportunity if fundamentals are strong\n"
-        else:
-            analysis += "📊 Normal trading - Monitor for trends\n"
-        
-        analysis += "\n⚠️ Note: This is basic technical analysis only.\n"
-        analysis += "For detailed AI-powered fundamental analysis, please load an AI model."
-        
-        return analysis
+    def analyze_holders(self, ticker):
+        try:
+            if _holdings_index is None:
+                self.window.after(0, lambda: self.update_status("🔄 Loading all portfolios...", self.colors['warning']))
+            index = get_holdings_index()
+            holders = index.holders_of(ticker)
+
+            holders_text = f"💼 SUPERINVESTORS HOLDING {ticker}\n"
+            holders_text += "=" * 60 + "\n\n"
+            if holders:
+                holders_text += f"{len(holders)} of {len(index.by_investor)} tracked investors hold {ticker}:\n\n"
+                for i, name in enumerate(holders, 1):
+                    rank = index.by_investor[name].index(ticker) + 1
+                    holders_text += f"{i:2d}. {name:22s} - #{rank} position\n"
+            else:
+                holders_text += f"None of the {len(index.by_investor)} tracked investors hold {ticker}.\n"
+            if index.failed:
+                holders_text += f"\n⚠️ Could not load: {', '.join(index.failed)}\n"
+
+            self.window.after(0, lambda: self.display_portfolio_analysis(holders_text))
+            self.window.after(0, lambda: self.update_status("✅ Portfolios Loaded", self.colors['accent']))
+        except Exception as e:
+            print(f"❌ Error looking up holders of {ticker}: {e}")
+            logging.error(f"Error looking up holders of {ticker}: {e}")
+            logging.error(traceback.format_exc())
+            message = f"Holder lookup for {ticker} failed: {str(e)}"
+            self.window.after(0, lambda: self.display_error(message))
+
+    def analyze_screen(self, spec):
+        try:
+            symbols = resolve_symbol_list(spec)
+            if not symbols:
+                self.window.after(0, lambda: self.display_error(f"No symbols found for screen: {spec}"))
+                return
+
+            start = time.time()
+
+            def on_progress(done, total):
+                self.window.after(0, lambda: self.update_status(f"🔎 Screening {done}/{total}...", self.colors['warning']))
+
+            rows = self.engine.screen_symbols(symbols, on_progress=on_progress)
+            elapsed = time.time() - start
+            csv_path = write_screen_csv(rows)
+
+            screen_text = f"🔎 AI SCREEN: {spec}\n"
+            screen_text += "=" * 60 + "\n\n"
+            screen_text += f"{len(rows)} symbols in {elapsed:.0f}s ({len(rows) / max(elapsed, 1e-9) * 60:.1f} per minute)\n\n"
+            screen_text += format_screen_table(rows) + "\n\n"
+            screen_text += f"💾 Saved to {csv_path}\n"
+            if not self.engine.model_loaded:
+                screen_text += "⚠️ AI model not available: calls come from basic analysis only.\n"
+
+            self.window.after(0, lambda: self.display_portfolio_analysis(screen_text))
+            self.window.after(0, self.update_ai_status)
+        except Exception as e:
+            print(f"❌ Error screening {spec}: {e}")
+            traceback.print_exc()
+            logging.error(f"Error screening {spec}: {e}")
+            logging.error(traceback.format_exc())
+            message = f"Screen of {spec} failed: {str(e)}"
+            self.window.after(0, lambda: self.display_error(message))
+
+    def analyze_filter(self, query):
+        try:
+            if _screener_table is None:
+                self.window.after(0, lambda: self.update_status("🔄 Building screener table...", self.colors['warning']))
+            table = get_screener_table()
+            rows, columns, total, elapsed = run_screen_query(query, table)
+
+            filter_text = f"🧮 FILTER: {query}\n"
+            filter_text += "=" * 60 + "\n\n"
+            filter_text += f"{len(rows)} of {total} tickers in {elapsed * 1000:.1f} ms\n\n"
+            filter_text += format_screener_rows(rows, columns) + "\n\n"
+            filter_text += f"Columns: {', '.join(c for c in table.columns if c not in ('symbol', 'name'))}\n"
+
+            self.window.after(0, lambda: self.display_portfolio_analysis(filter_text))
+            self.window.after(0, lambda: self.update_status("✅ Screener Ready", self.colors['accent']))
+        except ValueError as e:
+            message = f"Bad filter: {e}"
+            self.window.after(0, lambda: self.display_error(message))
+        except Exception as e:
+            print(f"❌ Error filtering {query}: {e}")
+            logging.error(f"Error filtering {query}: {e}")
+            logging.error(traceback.format_exc())
+            message = f"Filter failed: {str(e)}"
+            self.window.after(0, lambda: self.display_error(message))
+
+    def analyze_compare(self, spec, chart_range=None):
+        try:
+            chart_range = chart_range or self.chart_range
+            investor_code = resolve_name_to_dataroma_code(spec)
+            symbols = get_dataroma_portfolio(investor_code) if investor_code else resolve_symbol_list(spec)
+            symbols = symbols[:COMPARE_MAX_SYMBOLS]
+            if not symbols:
+                self.window.after(0, lambda: self.display_error(f"No symbols found to compare: {spec}"))
+                return
+
+            start = time.time()
+            closes = comparison_history(symbols, chart_range)
+            if closes is None:
+                self.window.after(0, lambda: self.display_error(f"No price history found for: {', '.join(symbols)}"))
+                return
+            returns = normalized_returns(closes)
+            final = {symbol: returns[~np.isnan(returns[:, i]), i][-1] for i, symbol in enumerate(closes.columns)}
+
+            compare_text = f"📊 COMPARE: {spec} ({chart_range})\n"
+            compare_text += "=" * 60 + "\n\n"
+            compare_text += f"{len(final)} tickers, loaded in {time.time() - start:.1f}s\n\n"
+            for i, (symbol, value) in enumerate(sorted(final.items(), key=lambda item: -item[1]), 1):
+                compare_text += f"{i:3d}. {symbol:7s} {value:+8.1f}%\n"
+            missing = [symbol for symbol in symbols if symbol.upper() not in final]
+            if missing:
+                compare_text += f"\n⚠️ No data for: {', '.join(missing)}\n"
+
+            self.window.after(0, lambda: self.display_portfolio_analysis(compare_text))
+            self.window.after(0, lambda: self.show_comparison(spec, closes, chart_range))
+        except Exception as e:
+            print(f"❌ Error comparing {spec}: {e}")
+            logging.error(f"Error comparing {spec}: {e}")
+            logging.error(traceback.format_exc())
+            message = f"Comparison of {spec} failed: {str(e)}"
+            self.window.after(0, lambda: self.display_error(message))
+
+    def begin_analysis_stream(self):
+        """Start a new analysis and return its id; output tagged with an older id is dropped"""
+        with self._stream_lock:
+            self._stream_id += 1
+            self._stream_tokens = []
+            return self._stream_id
+
+    def start_analysis_stream(self, stream_id, symbol, stock_data, company_info):
+        """Show the analysis header now and return a token callback that fills in the AI text.
+
+        Tokens arrive on the inference thread and are batched into the text
+        widget every STREAM_FLUSH_MS, so Tk only redraws a few times a second.
+        """
+        self.window.after(0, lambda: self.display_stock_analysis(symbol, stock_data, company_info, "", streaming=True, stream_id=stream_id))
+
+        def on_token(token):
+            with self._stream_lock:
+                if stream_id != self._stream_id:
+                    return
+                self._stream_tokens.append(token)
+                if self._stream_flush_pending:
+                    return
+                self._stream_flush_pending = True
+            self.window.after(STREAM_FLUSH_MS, lambda: self.flush_analysis_stream(stream_id))
+
+        return on_token
+
+    def flush_analysis_stream(self, stream_id):
+        with self._stream_lock:
+            self._stream_flush_pending = False
+            if stream_id != self._stream_id:
+                return
+            text = "".join(self._stream_tokens)
+            self._stream_tokens = []
+        if text:
+            self.result_text.insert(tk.END, text)
+            self.result_text.see(tk.END)
 
-    def display_stock_analysis(self, symbol, stock_data, company_info, analysis):
+    def stop_analysis_stream(self):
+        """Drop tokens still on their way from an earlier analysis"""
+        with self._stream_lock:
+            self._stream_id += 1
+
+    def display_stock_analysis(self, symbol, stock_data, company_info, analysis, streaming=False, stream_id=None):
+        if stream_id is not None and stream_id != self._stream_id:
+            return  # a newer analysis owns the results pane
+        if not streaming:
+            # The final text replaces whatever was streamed so far
+            self.stop_analysis_stream()
         self.result_text.delete(1.0, tk.END)
         
-        result = f"🎯 STOCK ANALYSIS: {symbol}\n"
-        result += "=" * 50 + "\n\n"
-        
-        result += f"📋 COMPANY INFORMATION:\n"
-        result += f"Name: {company_info.get('name', 'Unknown')}\n"
-        result += f"Sector: {company_info.get('sector', 'Unknown')}\n"
-        result += f"Industry: {company_info.get('industry', 'Unknown')}\n"
-        result += f"Country: {company_info.get('country', 'Unknown')}\n\n"
-        
-        result += f"💰 PRICE DATA:\n"
-        result += f"Current Price: ${stock_data['c']:.2f}\n"
-        result += f"Previous Close: ${stock_data['pc']:.2f}\n"
-        daily_change = stock_data['c'] - stock_data['pc']
-        daily_change_percent = (daily_change / stock_data['pc']) * 100
-        result += f"Daily Change: ${daily_change:.2f} ({daily_change_percent:+.2f}%)\n"
-        result += f"Day High: ${stock_data['h']:.2f}\n"
-        result += f"Day Low: ${stock_data['l']:.2f}\n\n"
-        
-        if company_info.get('marketCap'):
-            market_cap = company_info['marketCap']
-            if market_cap >= 1e9:
-                result += f"Market Cap: ${market_cap/1e9:.2f}B\n\n"
-            elif market_cap >= 1e6:
-                result += f"Market Cap: ${market_cap/1e6:.2f}M\n\n"
-        
-        result += f"🤖 ANALYSIS:\n"
-        result += "=" * 30 + "\n"
+        result = format_analysis_header(symbol, stock_data, company_info)
+        if streaming:
+            self.result_text.insert(tk.END, result)
+            return
         result += analysis + "\n\n"
         
         result += f"⚡ Analysis completed: {time.strftime('%H:%M:%S')}\n"
@@ -775,10 +4201,12 @@ class StockAnalyzer:
         self.result_text.insert(tk.END, result)
 
     def display_portfolio_analysis(self, portfolio_text):
+        self.stop_analysis_stream()
         self.result_text.delete(1.0, tk.END)
         self.result_text.insert(tk.END, portfolio_text)
 
     def display_error(self, error_message):
+        self.stop_analysis_stream()
         self.result_text.delete(1.0, tk.END)
         error_text = f"❌ ERROR\n"
         error_text += "=" * 30 + "\n\n"
@@ -791,145 +4219,90 @@ class StockAnalyzer:
         
         self.result_text.insert(tk.END, error_text)
 
-    def get_stock_data(self, symbol):
-        try:
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period="2d")
-            if hist.empty:
-                return {"error": "Data not available"}
-            return {
-                "c": hist["Close"].iloc[-1],
-                "pc": hist["Close"].iloc[-2] if len(hist) > 1 else hist["Close"].iloc[-1],
-                "h": hist["High"].iloc[-1],
-                "l": hist["Low"].iloc[-1],
-            }
-        except Exception as e:
-            logging.error(f"Error fetching stock data for {symbol}: {e}")
-            return {"error": str(e)}
-
-    def get_company_info(self, symbol):
-        try:
-            stock = yf.Ticker(symbol)
-            info = stock.info or {}
-            return {
-                "name": info.get("shortName", info.get("longName", symbol)),
-                "industry": info.get("industry", "Unknown"),
-                "sector": info.get("sector", "Unknown"),
-                "country": info.get("country", "Unknown"),
-                "marketCap": info.get("marketCap", 0),
-            }
-        except Exception as e:
-            logging.error(f"Error fetching company info for {symbol}: {e}")
-            return {
-                "name": symbol,
-                "industry": "Unknown",
-                "sector": "Unknown",
-                "country": "Unknown",
-                "marketCap": 0,
-            }
+    def plot_stock_price(self, symbol):
+        if not symbol:
+            messagebox.showwarning("Warning", "Enter a stock symbol first!")
+            return
+        symbol = symbol.upper()
+        chart_range = self.chart_range
 
-    def create_ai_analysis(self, symbol, data, company_info):
-        current_price = data["c"]
-        previous_close = data["pc"]
-        daily_change = current_price - previous_close
-        daily_change_percent = (daily_change / previous_close) * 100
-        
-        # Shorter, more focused prompt to prevent crashes
-        prompt = f"""YOU ARE A FINANCIAL ANALYST AI. GIVE A DETAILED ANALYSIS OF THE STOCK MARKET DATA BELOW. DONT USE TOO MUCH JARGON, BE CONCISE AND TO THE POINT.
+        def load():
+            hist, error = None, None
+            try:
+                hist = chart_history(symbol, chart_range)
+            except Exception as e:
+                error = e
+            self.window.after(0, lambda: self.show_chart(symbol, hist, chart_range, error))
 
-Stock: {symbol}
-Price: ${current_price:.2f}
-Change: {daily_change_percent:+.1f}%
-High: ${data['h']:.2f}
-Low: ${data['l']:.2f}
+        threading.Thread(target=load, daemon=True).start()
 
-Give a short analysis and recommendation (BUY/HOLD/SELL):"""
+    def select_chart_range(self, chart_range):
+        self.chart_range = chart_range
+        self.highlight_chart_range()
+        if self.compare_spec:
+            spec = self.compare_spec
+            threading.Thread(target=lambda: self.analyze_compare(spec, chart_range), daemon=True).start()
+        elif self.chart is not None and self.chart.symbol:
+            self.plot_stock_price(self.chart.symbol)
 
-        try:
-            if not self.model or not self.model_loaded:
-                return self.create_basic_analysis(symbol, data, company_info)
-            
-            print(f"🤖 Starting AI analysis: {symbol}")
-            logging.info(f"Starting AI analysis for {symbol}")
-            
-            # Use more conservative settings to prevent crashes
-            response = self.model.generate(
-                prompt, 
-                max_tokens=200,  # Reduced from 400
-                temp=0.1,        # Lower temperature for stability
-                top_p=0.8,       # More conservative
-                repeat_penalty=1.05,  # Reduced
-                 # Single thread for stability
+    def highlight_chart_range(self):
+        for chart_range, button in self.chart_range_buttons.items():
+            selected = chart_range == self.chart_range
+            button.config(
+                bg=self.colors['accent'] if selected else self.colors['bg_primary'],
+                fg="white" if selected else self.colors['text_secondary'],
             )
-            
-            analysis = response.strip()
-            if not analysis or len(analysis) < 10:
-                logging.warning("AI response too short, falling back to basic analysis")
-                return f"❌ AI response incomplete!\n\n{self.create_basic_analysis(symbol, data, company_info)}"
-            
-            print(f"✅ AI analysis completed: {len(analysis)} characters")
-            logging.info(f"AI analysis completed successfully: {len(analysis)} characters")
-            return analysis
-            
-        except Exception as e:
-            print(f"❌ Error generating AI analysis: {e}")
-            traceback.print_exc()
-            logging.error(f"Error generating AI analysis: {e}")
-            logging.error(traceback.format_exc())
-            return f"❌ AI Analysis Error: {str(e)}\n\n{self.create_basic_analysis(symbol, data, company_info)}"
 
-    def plot_stock_price(self, symbol):
-        if not symbol:
-            messagebox.showwarning("Warning", "Enter a stock symbol first!")
+    def show_chart(self, symbol, hist, chart_range, error=None):
+        """Draw hist in the embedded chart panel, creating the panel on first use"""
+        if chart_range != self.chart_range:
+            return  # another range was picked while this one loaded
+        if error is None and hist is None:
+            messagebox.showerror("Error", f"No data found for {symbol}")
             return
-        
         try:
-            import matplotlib.pyplot as plt
-            import matplotlib.dates as mdates
-            plt.style.use('dark_background')
-            
-            stock = yf.Ticker(symbol.upper())
-            hist = stock.history(period="1mo")
-            
-            if hist.empty:
-                messagebox.showerror("Error", f"No data found for {symbol}")
-                return
-            
-            fig, ax = plt.subplots(figsize=(12, 7))
-            
-            ax.plot(hist.index, hist['Close'], linewidth=3, color='#00D084', alpha=0.8, label='Close Price')
-            ax.fill_between(hist.index, hist['Close'], alpha=0.2, color='#00D084')
-            
-            ax2 = ax.twinx()
-            ax2.bar(hist.index, hist['Volume'], alpha=0.3, color='#3742FA', label='Volume')
-            ax2.set_ylabel('Volume', color='#3742FA')
-            
-            ax.set_title(f'{symbol.upper()} Stock Price & Volume - Last 30 Days', 
-                        fontsize=16, fontweight='bold', pad=20, color='white')
-            ax.set_xlabel('Date', fontsize=12, color='white')
-            ax.set_ylabel('Price ($)', fontsize=12, color='white')
-            ax.grid(True, alpha=0.3, linestyle='--')
-            
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-            ax.xaxis.set_major_locator(mdates.WeekdayLocator())
-            plt.xticks(rotation=45)
-            
-            current_price = hist['Close'].iloc[-1]
-            ax.annotate(f'${current_price:.2f}', 
-                       xy=(hist.index[-1], current_price),
-                       xytext=(10, 10), textcoords='offset points',
-                       bbox=dict(boxstyle='round,pad=0.3', fc='#00D084', alpha=0.8),
-                       fontsize=12, fontweight='bold', color='white')
-            
-            plt.tight_layout()
-            plt.show()
-            
+            if error is not None:
+                raise error
+            if self.chart is None:
+                self.chart = ChartPanel(self.chart_frame, self.colors)
+            self.show_chart_widget(self.chart.widget)
+            self.compare_spec = None
+            self.chart.show(symbol, hist, chart_range)
         except ImportError:
             messagebox.showerror("Error", "Matplotlib library required for charts.\n\nInstall with: pip install matplotlib")
         except Exception as e:
             logging.error(f"Error creating chart: {e}")
             messagebox.showerror("Error", f"Could not create chart for {symbol}: {str(e)}")
 
+    def show_comparison(self, spec, closes, chart_range):
+        """Draw a comparison in the chart area, in place of the single-ticker chart"""
+        if chart_range != self.chart_range:
+            return
+        try:
+            if self.comparison is None:
+                self.comparison = ComparisonPanel(self.chart_frame, self.colors)
+            self.show_chart_widget(self.comparison.widget)
+            self.compare_spec = spec
+            self.comparison.show(closes, chart_range, title=f"{spec} - Cumulative Return - {chart_range}")
+        except ImportError:
+            messagebox.showerror("Error", "Matplotlib library required for charts.\n\nInstall with: pip install matplotlib")
+        except Exception as e:
+            logging.error(f"Error creating comparison chart: {e}")
+            messagebox.showerror("Error", f"Could not create comparison chart for {spec}: {str(e)}")
+
+    def show_chart_widget(self, widget):
+        """Make widget the one canvas shown in the chart area, and show the area"""
+        for panel in (self.chart, self.comparison):
+            if panel is not None and panel.widget is not widget:
+                panel.widget.pack_forget()
+        if not widget.winfo_manager():
+            widget.pack(fill=tk.X)
+        if not self.chart_frame.winfo_ismapped():
+            self.chart_frame.pack(fill=tk.X, padx=20, pady=(0, 20), before=self.result_text.master)
+
+    def hide_chart(self):
+        self.chart_frame.pack_forget()
+
     def run(self):
         try:
             print("🚀 Starting main application loop...")
@@ -944,50 +4317,150 @@ Give a short analysis and recommendation (BUY/HOLD/SELL):"""
             print("👋 Application main loop ended")
 
 
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Veriss Stock Analyzer. Without a command the desktop app starts.",
+    )
+    parser.add_argument("--config", default=MODEL_CONFIG_PATH, help="model settings JSON file")
+    parser.add_argument("--model", help="path to a .gguf model file")
+    parser.add_argument("--threads", type=int, help="inference threads (default: physical cores)")
+    parser.add_argument("--ctx", type=int, help="model context size in tokens")
+    parser.add_argument("--batch", type=int, help="prompt processing batch size")
+    parser.add_argument("--device", help="GPT4All device, e.g. cpu or gpu")
+    parser.add_argument("--startup-report", action="store_true", help="print startup timings at first paint and once holdings and the model have loaded, then exit")
+
+    commands = parser.add_subparsers(dest="command")
+    analyze = commands.add_parser("analyze", help="analyze one or more symbols without the GUI")
+    analyze.add_argument("symbols", nargs="+", help="stock symbols, e.g. AAPL MSFT")
+    screen = commands.add_parser("screen", help="rank a watchlist, investor portfolio or symbol file")
+    screen.add_argument("target", nargs="+", help='symbols, an investor name, a file path or "watchlist"')
+    screener = commands.add_parser("filter", help='query all portfolio and watchlist tickers, e.g. "pe < 15 and change > 0 sort by market_cap desc"')
+    screener.add_argument("query", nargs="+", help="filter expression, optionally followed by 'sort by <expr> [desc]' and 'limit N'")
+    screener.add_argument("--refresh", action="store_true", help="re-download fundamentals instead of using the cached ones")
+    for command in (analyze, screen, screener):
+        command.add_argument("--json", action="store_true", help="print machine-readable JSON")
+    serve = commands.add_parser("serve", help="share one model and quote cache over a local HTTP/JSON API")
+    serve.add_argument("--host", default=SERVICE_HOST, help=f"interface to bind (default: {SERVICE_HOST})")
+    serve.add_argument("--port", type=int, default=SERVICE_PORT, help=f"port to listen on (default: {SERVICE_PORT})")
+    for command in (analyze, screen, serve):
+        command.add_argument("--no-ai", action="store_true", help="skip the AI model and use basic analysis")
+    return parser
+
+def model_overrides_from_args(args):
+    return {
+        "model": args.model,
+        "n_threads": args.threads,
+        "n_ctx": args.ctx,
+        "n_batch": args.batch,
+        "device": args.device,
+    }
+
+def run_cli(args):
+    """Headless entry point: runs analyze/screen/serve on an AnalysisEngine without Tk"""
+    engine = AnalysisEngine(config_path=args.config, model_overrides=model_overrides_from_args(args))
+    use_ai = not getattr(args, "no_ai", True)
+    failed = False
+
+    if args.command == "filter":
+        query = " ".join(args.query)
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                rows, columns, total, elapsed = run_screen_query(query, get_screener_table(refresh=args.refresh))
+            except ValueError as e:
+                print(f"❌ Bad filter: {e}")
+                return 2
+            finally:
+                engine.shutdown()
+            print(f"🧮 {len(rows)} of {total} tickers in {elapsed * 1000:.1f} ms")
+        print(json.dumps(rows, indent=2) if args.json else format_screener_rows(rows, columns))
+        return 0
+
+    if args.command == "serve":
+        # Serve right away; /analyze falls back to basic analysis until the model is ready
+        if use_ai:
+            engine.load_model()
+        try:
+            run_service(engine, args.host, args.port)
+        finally:
+            engine.shutdown()
+        return 0
+
+    # Progress chatter goes to stderr so stdout stays clean for --json
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if use_ai:
+                engine.load_model()
+                engine.wait_for_model()
+
+            if args.command == "analyze":
+                symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in args.symbols))
+                price_store.sync(symbols)
+                engine.prefetch_indicators(symbols)
+                results = fetch_concurrently(
+                    lambda symbol: engine.analyze(symbol, use_ai=use_ai),
+                    symbols,
+                    max_workers=SCREEN_MAX_IN_FLIGHT,
+                    timeout=SCREEN_ITEM_TIMEOUT,
+                )
+                output = [
+                    {"symbol": symbol, "error": str(result)} if isinstance(result, Exception) else result
+                    for symbol, result in zip(symbols, results)
+                ]
+                failed = any("error" in result for result in output)
+            else:
+                spec = " ".join(args.target)
+                symbols = resolve_symbol_list(spec)
+                output = engine.screen_symbols(symbols) if symbols else []
+                failed = not output
+                if output:
+                    print(f"💾 Saved to {write_screen_csv(output)}")
+                else:
+                    print(f"❌ No symbols found for screen: {spec}")
+        finally:
+            engine.shutdown()
+
+    if args.json:
+        print(json.dumps(output, indent=2))
+    elif args.command == "analyze":
+        print(("\n" + "─" * 60 + "\n\n").join(format_analysis_report(result) for result in output))
+    elif output:
+        print(format_screen_table(output))
+    return 1 if failed else 0
+
 if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    if args.command:
+        sys.exit(run_cli(args))
+
     try:
         print("🚀 Starting Stock Analyzer...")
         print("📦 Checking dependencies...")
         
-        # Check critical imports
-        try:
-            import tkinter as tk
-            print("✅ Tkinter OK")
-        except ImportError as e:
-            print(f"❌ Tkinter missing: {e}")
-            input("Press Enter to exit...")
-            sys.exit(1)
-            
-        try:
-            import yfinance as yf
-            print("✅ YFinance OK")
-        except ImportError as e:
-            print(f"❌ YFinance missing. Install with: pip install yfinance")
-            print(f"Error: {e}")
-            input("Press Enter to exit...")
-            sys.exit(1)
-            
-        try:
-            from bs4 import BeautifulSoup
-            print("✅ BeautifulSoup OK")
-        except ImportError as e:
-            print(f"❌ BeautifulSoup missing. Install with: pip install beautifulsoup4")
-            print(f"Error: {e}")
-            input("Press Enter to exit...")
-            sys.exit(1)
-            
-        try:
-            import requests
-            print("✅ Requests OK")
-        except ImportError as e:
-            print(f"❌ Requests missing. Install with: pip install requests")
-            print(f"Error: {e}")
+        if tk is None:
+            print("❌ Tkinter missing. Use the analyze/screen commands on headless machines.")
             input("Press Enter to exit...")
             sys.exit(1)
+        print("✅ Tkinter OK")
+
+        # Check critical packages without importing them; the heavy ones load on first use
+        dependencies = [
+            ("yfinance", "YFinance", "pip install yfinance"),
+            ("requests", "Requests", "pip install requests"),
+        ]
+        for module_name, label, install_hint in dependencies:
+            if importlib.util.find_spec(module_name) is None:
+                print(f"❌ {label} missing. Install with: {install_hint}")
+                input("Press Enter to exit...")
+                sys.exit(1)
+            print(f"✅ {label} OK")
 
         print("🚀 All dependencies OK, starting application...")
         
-        app = StockAnalyzer()
+        app = StockAnalyzer(
+            startup_report_only=args.startup_report,
+            config_path=args.config,
+            model_overrides=model_overrides_from_args(args),
+        )
         print("✅ Application initialized successfully")
         app.run()
         
@@ -1004,7 +4477,7 @@ if __name__ == "__main__":
         logging.error(traceback.format_exc())
         print("\n💡 Common solutions:")
         print("1. Make sure all dependencies are installed:")
-        print("   pip install gpt4all yfinance beautifulsoup4 requests matplotlib")
+        print("   pip install gpt4all yfinance requests matplotlib")
         print("2. Check your Python version (3.7+ required)")
         print("3. Try running as administrator")
         print("4. Check if any antivirus is blocking the app")